@@ -0,0 +1,343 @@
+# Benchmark suite for the SET Lab Management Tool.
+#
+# Generates seeded synthetic timetables in the column schema store_data expects,
+# times the upload, the view callbacks and every pie/table/timeline/calendar builder,
+# and writes the results to a JSON file so runs can be compared between releases.
+#
+#   python benchmark.py --sizes 1000 10000 --repeat 3 --output benchmark_results.json
+
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import urllib.parse
+from datetime import datetime, time as time_of_day, timezone
+
+import numpy as np
+import pandas as pd
+
+# The parse and background caches of main.py are pointed at scratch directories before the app is imported.
+# A configured directory is overridden, so a run never evicts, publishes to or relays into a live cache.
+os.environ['PARSE_CACHE_DIR'] = tempfile.mkdtemp(prefix='setlab-benchmark-')
+os.environ['BACKGROUND_CACHE_DIR'] = tempfile.mkdtemp(prefix='setlab-benchmark-background-')
+
+import dash
+import main
+
+default_sizes = [1000, 10000, 100000, 500000]
+
+buildings = ['Engineering North', 'Engineering South', 'Ingkarni Wardli', 'Molecular Life Sciences', 'Waite Building', 'Barr Smith South', 'Napier']
+subjects = ['CHEM', 'ELEC', 'MECH', 'PHYSICS', 'BIOLOGY', 'CIVIL', 'COMP SCI', 'GEOLOGY']
+components = ['Practical', 'Workshop', 'Tutorial', 'Laboratory', None]
+tech_teams = list(main.tech_team_mapping) + [None]
+
+# Function to generate a seeded synthetic timetable with n_sections rows in the upload schema
+def generate_timetable(n_sections, seed=0):
+    rng = np.random.default_rng(seed)
+
+    # About ten sections per course and fifty sections per room and term
+    n_courses = max(2, n_sections // 10)
+    n_rooms = max(10, n_sections // 100)
+
+    terms = rng.choice(list(main.term_mapping), n_sections)
+    course = rng.integers(0, n_courses, n_sections)
+    room = rng.integers(0, n_rooms, n_sections)
+    building = room % len(buildings)
+    class_nbr = rng.integers(10000, 99999, n_sections)
+    pattern_nbr = rng.integers(1, 4, n_sections)
+
+    df = pd.DataFrame({
+        'Term': terms,
+        'Subject': np.array(subjects)[course % len(subjects)],
+        'Catalog': (1000 + course % 3000).astype(str),
+        'Course ID': (100000 + course).astype(str),
+        'Course Descr': [f"Course {index}" for index in course],
+        'Component': rng.choice(np.array(components, dtype=object), n_sections),
+        'Class Nbr': class_nbr,
+        'Pattern Nbr': pattern_nbr,
+        'Class_Pat': [f"{nbr}_{pattern}" for nbr, pattern in zip(class_nbr, pattern_nbr)],
+        'Building': building.astype(str),
+        'Building Descr': np.array(buildings)[building],
+        'Room': [f"G{index // len(buildings):02d}" for index in room],
+        'Facil ID': room.astype(str),
+        'Room Capacity': 20 + room % 60,
+        'Enrl Capacity': rng.integers(10, 80, n_sections),
+        'Tech Team': rng.choice(np.array(tech_teams, dtype=object), n_sections),
+    })
+
+    # Most sections meet on one or two weekdays
+    for day in main.weekday_mapping:
+        df[day] = np.where(rng.random(n_sections) < 0.3, 'Y', 'N')
+
+    start_hour = rng.integers(8, 18, n_sections)
+    duration = rng.integers(1, 4, n_sections)
+    df['Meeting Start'] = [time_of_day(hour) for hour in start_hour]
+    df['Meeting End'] = [time_of_day(min(hour + length, 23)) for hour, length in zip(start_hour, duration)]
+
+    # Terms run for twelve weeks from their first Monday
+    term_starts = {term: pd.Timestamp('2024-02-26') + pd.Timedelta(weeks=21 * index) for index, term in enumerate(main.term_mapping)}
+    df['Start Date'] = df['Term'].map(term_starts)
+    df['End Date'] = df['Start Date'] + pd.Timedelta(weeks=12)
+    return df
+
+# Function to encode a timetable like the upload component does, as a csv or Excel data URL
+def upload_contents(df, file_format):
+    buffer = io.BytesIO()
+    if file_format == 'csv':
+        buffer.write(df.to_csv(index=False).encode('utf-8'))
+    else:
+        # The exported report has a title row above the header, store_data skips it
+        with pd.ExcelWriter(buffer) as writer:
+            pd.DataFrame([['Class Schedule']]).to_excel(writer, index=False, header=False)
+            df.to_excel(writer, index=False, startrow=1)
+    return 'data:application/octet-stream;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+# Function to find the registered Dash callback of a function
+def find_callback(name):
+    for output, callback in main.app.callback_map.items():
+        if getattr(callback.get('callback'), '__name__', None) == name:
+            return output, callback
+    raise KeyError(f"Callback {name} not found.")
+
+# Function to build the body of a Dash callback request, the way the browser sends it
+def callback_body(name, values):
+    output, callback = find_callback(name)
+    outputs = []
+    for part in output.strip('.').split('...'):
+        component_id, component_property = part.rsplit('.', 1)
+        outputs.append({'id': component_id, 'property': component_property.split('@')[0]})
+    inputs = [dict(spec, value=values[f"{spec['id']}.{spec['property']}"]) for spec in callback['inputs']]
+    state = [dict(spec, value=values[f"{spec['id']}.{spec['property']}"]) for spec in callback['state']]
+    return {
+        'output': output,
+        'outputs': outputs if output.startswith('..') else outputs[0],
+        'inputs': inputs,
+        'state': state,
+        'changedPropIds': [f"{spec['id']}.{spec['property']}" for spec in callback['inputs']],
+    }
+
+# Function to post a callback request to the app and return the response size in bytes.
+# Background callbacks answer with a job handle first; the result is polled for like the browser does.
+def post_callback(client, name, values):
+    body = callback_body(name, values)
+    response = client.post('/_dash-update-component', json=body)
+    while True:
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"{name} failed with status {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        result = response.get_json(silent=True) if response.status_code == 200 else None
+        if not result or 'response' in result:
+            return len(response.get_data())
+        if 'cacheKey' in result:
+            handle = {'cacheKey': result['cacheKey'], 'job': result['job']}
+        time.sleep(0.01)
+        response = client.post('/_dash-update-component', query_string=handle, json=body)
+
+# Function to download an export and return its size in bytes
+def export_download(client, export_format, query):
+    response = client.get(f'/export/{export_format}', query_string=query)
+    if response.status_code != 200:
+        raise RuntimeError(f"{export_format} export failed with status {response.status_code}")
+    size = sum(len(block) for block in response.response)
+    response.close()
+    return size
+
+# Function to request a calendar feed and return its size in bytes, optionally from an empty feed cache
+def feed_download(client, path, headers=None, clear=False):
+    if clear:
+        main.feed_cache.clear()
+    response = client.get(path, headers=headers)
+    if response.status_code not in (200, 304):
+        raise RuntimeError(f"{path} failed with status {response.status_code}")
+    return len(response.get_data())
+
+# Function to time a function over several repeats
+def measure(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min_seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'max_seconds': max(timings),
+        'repeat': repeat,
+    }, result
+
+# Function to pick the selections the views are benchmarked with: the first term, two courses and one room
+def benchmark_selection(df):
+    term = int(df['Term'].iloc[0])
+    term_rows = df[df['Term'] == term]
+    courses = term_rows['Course Descr'].value_counts().index[:2].tolist()
+    building = term_rows['Building Descr'].value_counts().index[0]
+    room = term_rows.loc[term_rows['Building Descr'] == building, 'Room'].value_counts().index[0]
+    start_date = term_rows['Start Date'].min().strftime('%Y-%m-%d')
+    end_date = term_rows['End Date'].max().strftime('%Y-%m-%d')
+    return {'term': term, 'courses': courses, 'building': building, 'room': room, 'start_date': start_date, 'end_date': end_date}
+
+# Function to run every benchmark for one timetable size
+def run_size(client, n_sections, file_format, repeat, row_limit, seed):
+    results = {}
+    df = generate_timetable(n_sections, seed)
+    contents = upload_contents(df, file_format)
+    filename = f"timetable.{file_format}"
+    selection = benchmark_selection(df)
+    print(f"{n_sections} sections, {len(contents) / 1e6:.1f} MB upload")
+
+    # Function to record one benchmark and print it
+    def record(name, func, rows=None):
+        timing, result = measure(func, repeat)
+        if isinstance(result, int):
+            timing['response_bytes'] = result
+        if rows is not None:
+            timing['rows'] = rows
+        results[name] = timing
+        print(f"  {name:40s} {timing['median_seconds']:9.3f}s")
+
+    upload_id = main.upload_key(main.decode_contents(contents), filename)
+
+    # Cold uploads parse the file, warm uploads hit the in-memory registry.
+    # Only the parse cache entry of this upload is removed.
+    def cold_upload():
+        main.dataset_registry.clear()
+        for path in main.parse_cache_paths(upload_id):
+            if os.path.exists(path):
+                os.remove(path)
+        return post_callback(client, 'store_data', {'upload-data.contents': contents, 'upload-data.filename': filename})
+
+    record('store_data', cold_upload)
+    record('store_data (re-upload)', lambda: post_callback(client, 'store_data', {'upload-data.contents': contents, 'upload-data.filename': filename}))
+    dataset = main.get_dataset(upload_id)
+
+    sample = dataset.df.head(row_limit)
+    record('generate_course_dates', lambda: sample.apply(lambda row: main.generate_course_dates(row, main.weekday_mapping), axis=1), rows=len(sample))
+
+    course_request = {
+        'terms': [selection['term']],
+        'courses': selection['courses'],
+        'start_date': selection['start_date'],
+        'end_date': selection['end_date'],
+    }
+    location_request = {
+        'terms': [selection['term']],
+        'tech_teams': None,
+        'buildings': [selection['building']],
+        'rooms': [selection['room']],
+        'start_date': selection['start_date'],
+        'end_date': selection['end_date'],
+    }
+    for button in ['show-pie-chart', 'show-table', 'show-timeline', 'show-capacity', 'show-calendar']:
+        values = {'course-view-request.data': dict(course_request, button=button), 'stored-data.children': upload_id}
+        record(f"update_course ({button})", lambda: post_callback(client, 'update_course', values))
+        values = {'location-view-request.data': dict(location_request, button=button), 'stored-data.children': upload_id}
+        record(f"update_location ({button})", lambda: post_callback(client, 'update_location', values))
+    for button in ['show-utilisation', 'show-conflicts', 'show-workload']:
+        values = {'location-view-request.data': dict(location_request, button=button), 'stored-data.children': upload_id}
+        record(f"update_location ({button})", lambda: post_callback(client, 'update_location', values))
+
+    # The builders get the same frames the callbacks pass them; they never write to them, so no copies are needed
+    start_date = pd.Timestamp(selection['start_date'])
+    end_date = pd.Timestamp(selection['end_date']).replace(hour=23, minute=59, second=59)
+    occurrences = dataset.occurrences_between(start_date, end_date)
+    course_filters = {'Term': [selection['term']], 'Course Descr': selection['courses'][:1]}
+    location_filters = main.location_filters([selection['term']], None, [selection['building']], [selection['room']])
+    course_df = main.explode_occurrences(dataset.select(course_filters, start_date, end_date), occurrences)
+    location_df = main.explode_occurrences(dataset.select(location_filters, start_date, end_date), occurrences)
+    course = selection['courses'][0]
+    table_spec = {'upload_id': upload_id, 'filters': course_filters}
+
+    record('create_children_for_locations', lambda: main.create_children_for_locations(course_df, start_date, end_date), rows=len(course_df))
+    record('create_table_for_selected_course', lambda: main.create_table_for_selected_course(course_df, start_date, end_date, course, table_spec), rows=len(course_df))
+    record('create_timeline_for_selected_course', lambda: main.create_timeline_for_selected_course(course_df, start_date, end_date, course), rows=len(course_df))
+    record('create_piecharts_for_locations', lambda: main.create_piecharts_for_locations(location_df, start_date, end_date), rows=len(location_df))
+    record('create_table_for_locations', lambda: main.create_table_for_locations(location_df, start_date, end_date, {'upload_id': upload_id, 'filters': location_filters}), rows=len(location_df))
+    record('create_timeline_for_selected_location', lambda: main.create_timeline_for_selected_location(location_df, start_date, end_date), rows=len(location_df))
+    record('create_capacity_overview', lambda: main.create_capacity_overview(location_df, 'location'), rows=len(location_df))
+    calendar_df = dataset.select(location_filters)
+    record('build_calendar', lambda: main.build_calendar(dataset, calendar_df, start_date, end_date), rows=len(calendar_df))
+    # The utilisation heatmap, the workload and the conflict report cover every room of the term
+    term_filters = main.location_filters([selection['term']], None, None, None)
+    record('create_utilisation_view', lambda: main.create_utilisation_view(dataset, term_filters, start_date, end_date), rows=len(dataset.df))
+    record('create_workload_view', lambda: main.create_workload_view(dataset, term_filters, start_date, end_date), rows=len(dataset.df))
+    term_spec = {'upload_id': upload_id, 'filters': term_filters, 'start_date': None, 'end_date': None}
+    record('conflict_report', lambda: main.conflict_report(dataset, term_spec), rows=len(dataset.occurrences))
+
+    # The room index is built once per dataset at upload, the free room finder queries every room at once
+    record('RoomIndex', lambda: main.RoomIndex(dataset.df, dataset.occurrences), rows=len(dataset.occurrences))
+    free_room_values = {
+        'free-room-button.n_clicks': 1,
+        'stored-data.children': upload_id,
+        'free-room-date.date': None,
+        'free-room-weekday.value': pd.Timestamp(selection['start_date']).weekday(),
+        'free-room-start.value': '10:00',
+        'free-room-end.value': '12:00',
+        'free-room-capacity.value': 20,
+        'tech-team-dropdown.value': None,
+        'location-term-dropdown.value': [selection['term']],
+        'location-date-range-picker.start_date': None,
+        'location-date-range-picker.end_date': None,
+    }
+    record('find_free_rooms', lambda: post_callback(client, 'find_free_rooms', free_room_values))
+
+    # Exports stream the whole term, the response is read block by block like a download
+    export_query = {'upload_id': upload_id, 'page': 'location', 'selection': json.dumps({'terms': [selection['term']]})}
+    for export_format in main.export_formats:
+        record(f"export ({export_format})", lambda: export_download(client, export_format, export_query), rows=len(dataset.occurrences))
+
+    # Calendar feeds: the first request renders the feed, polls that send its ETag back get a 304
+    main.publish_feed(upload_id)
+    room_rows = (dataset.df['Building Descr'] == selection['building']) & (dataset.df['Room'] == selection['room'])
+    feed_path = f"/feeds/room/{urllib.parse.quote(str(dataset.df.loc[room_rows, 'Location'].iloc[0]))}.ics"
+    main.feed_cache.clear()
+    record('feed (render)', lambda: feed_download(client, feed_path, clear=True))
+    feed_etag = client.get(feed_path).headers['ETag']
+    record('feed (cached)', lambda: feed_download(client, feed_path))
+    record('feed (not modified)', lambda: feed_download(client, feed_path, {'If-None-Match': feed_etag}))
+
+    return {'n_sections': n_sections, 'n_occurrences': len(dataset.occurrences), 'upload_bytes': len(contents), 'selection': selection, 'benchmarks': results}
+
+# Function to describe the environment the benchmarks ran in
+def environment():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        revision = None
+    return {
+        'git_revision': revision or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'dash': dash.__version__,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the SET Lab Management Tool on synthetic timetables.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=default_sizes, help='numbers of sections to generate')
+    parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv', help='upload file format')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the median is reported')
+    parser.add_argument('--row-limit', type=int, default=10000, help='rows passed to the row-wise generate_course_dates')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    # The builders log at INFO; keep the benchmark output readable
+    main.logging.getLogger().setLevel(main.logging.WARNING)
+    client = main.server.test_client()
+
+    runs = []
+    for n_sections in args.sizes:
+        runs.append(run_size(client, n_sections, args.format, args.repeat, args.row_limit, args.seed))
+
+    report = {'environment': environment(), 'format': args.format, 'seed': args.seed, 'runs': runs}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Results written to {args.output}")
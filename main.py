@@ -1,7 +1,7 @@
 # SET Lab Management Version V.1  3/5/2024 Location filtering  
 
 import dash
-from dash.dependencies import Input, Output, State 
+from dash.dependencies import Input, Output, State, MATCH
 from dash import dcc, html, callback
 from dash.exceptions import PreventUpdate
 from dash import dash_table
@@ -11,6 +11,7 @@ from pandas.tseries.offsets import MonthBegin, MonthEnd
 import plotly.express as px
 import plotly.graph_objs as go
 import pandas as pd
+import numpy as np
 import base64  
 import io
 import calendar
@@ -19,15 +20,34 @@ import time
 import logging
 import os
 import logging
+import threading
+import uuid
+import hashlib
+import re
+import functools
+import json
+import diskcache
+import openpyxl
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import flask
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
 
 
+# The heavy views run as background callbacks: each render is a separate process and the browser
+# polls for its progress and result, so a long render no longer holds a request open until the
+# gunicorn or Cloud Run timeout. Results and progress are passed through a local disk cache.
+BACKGROUND_CACHE_DIR = os.getenv('BACKGROUND_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.background_cache'))
+BACKGROUND_RESULT_EXPIRE = int(os.getenv('BACKGROUND_RESULT_EXPIRE', 600))
+background_callback_manager = dash.DiskcacheManager(diskcache.Cache(BACKGROUND_CACHE_DIR), expire=BACKGROUND_RESULT_EXPIRE)
+
 # Initialize the Dash app with the external stylesheet
 
-app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[
+app = dash.Dash(__name__, suppress_callback_exceptions=True, background_callback_manager=background_callback_manager, external_stylesheets=[
     'https://codepen.io/chriddyp/pen/bWLwgP.css',
     'https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/css/bootstrap.min.css',
     dbc.themes.BOOTSTRAP,
@@ -35,6 +55,252 @@ app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheet
 
 server = app.server
 
+# Instrumentation: latency and payload size histograms per callback and per internal stage,
+# exposed in the Prometheus text format on /metrics
+latency_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+size_buckets = [1e3, 1e4, 1e5, 3e5, 1e6, 3e6, 1e7]
+
+# A Prometheus histogram with cumulative buckets, one series per label combination
+class Histogram:
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+        os.register_at_fork(after_in_child=self.reset_after_fork)
+
+    # Function to give the histogram a fresh lock in a forked process, the lock may have been held at fork time.
+    # The child starts with no series, so what it records is exactly what it has to relay to the server.
+    def reset_after_fork(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    # Function to take the recorded series out of the histogram
+    def drain(self):
+        with self.lock:
+            series, self.series = self.series, {}
+        return series
+
+    # Function to add series recorded by a process to the totals of the histogram
+    def merge(self, totals, series):
+        for labels, (counts, total) in series.items():
+            own_counts, own_total = totals.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            totals[labels] = ([own + other for own, other in zip(own_counts, counts)], own_total + total)
+
+    # Function to record one observation
+    def observe(self, labels, value):
+        with self.lock:
+            counts, total = self.series.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-1] += 1
+            self.series[labels] = (counts, total + value)
+
+    # Function to render the totals of the histogram in the Prometheus text format
+    def render(self, totals):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(totals.items()):
+            label_str = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            for bound, count in zip(self.buckets + ['+Inf'], counts):
+                lines.append(f'{self.name}_bucket{{{label_str},le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_str}}} {total}")
+            lines.append(f"{self.name}_count{{{label_str}}} {counts[-1]}")
+        return lines
+
+# A Prometheus counter, one series per label combination
+class Counter:
+    def __init__(self, name, documentation, label_names):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.series = {}
+        self.lock = threading.Lock()
+        os.register_at_fork(after_in_child=self.reset_after_fork)
+
+    # Function to give the counter a fresh lock in a forked process, the lock may have been held at fork time
+    def reset_after_fork(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    # Function to take the recorded series out of the counter
+    def drain(self):
+        with self.lock:
+            series, self.series = self.series, {}
+        return series
+
+    # Function to add series recorded by a process to the totals of the counter
+    def merge(self, totals, series):
+        for labels, value in series.items():
+            totals[labels] = totals.get(labels, 0) + value
+
+    # Function to add to the counter
+    def inc(self, labels, value=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + value
+
+    # Function to render the totals of the counter in the Prometheus text format
+    def render(self, totals):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(totals.items()):
+            label_str = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{label_str}}} {value}")
+        return lines
+
+request_latency = Histogram('setlab_callback_request_seconds', 'Time to answer a Dash callback request, including JSON encoding. Background callbacks are timed from dispatch to the delivered result.', ['callback', 'view'], latency_buckets)
+callback_latency = Histogram('setlab_callback_seconds', 'Time spent in the body of a Dash callback.', ['callback', 'view'], latency_buckets)
+stage_latency = Histogram('setlab_stage_seconds', 'Time spent in an internal stage of a Dash callback.', ['callback', 'view', 'stage'], latency_buckets)
+response_size = Histogram('setlab_callback_response_bytes', 'Size of the Dash callback responses sent to the browser.', ['callback', 'view'], size_buckets)
+pie_figure_cache_requests = Counter('setlab_pie_figure_cache_requests_total', 'Lookups in the capacity pie figure cache.', ['result'])
+metrics = [request_latency, callback_latency, stage_latency, response_size, pie_figure_cache_requests]
+
+# Every process records its own metrics: each gunicorn worker and each forked background callback process.
+# They relay what they record through a queue in the background cache, and /metrics sums the queue into
+# totals kept in the same cache, so whichever worker is scraped answers for all of them.
+metrics_relay = diskcache.Deque(directory=os.path.join(BACKGROUND_CACHE_DIR, 'metrics'), maxlen=100000)
+metrics_store = diskcache.Cache(os.path.join(BACKGROUND_CACHE_DIR, 'metrics-store'))
+background_process = False
+
+# Function to mark a forked process as a background callback process. Dash forks them while answering
+# the dispatch request, so the child starts inside a copy of that request; worker processes forked by
+# gunicorn at startup do not.
+def mark_background_process():
+    global background_process
+    background_process = flask.has_request_context()
+
+os.register_at_fork(after_in_child=mark_background_process)
+
+# Function to send the metrics recorded in this process to the queue
+def relay_metrics():
+    relayed = {metric.name: metric.drain() for metric in metrics}
+    if any(relayed.values()):
+        metrics_relay.append(relayed)
+
+# Function to add the relayed metrics to the totals and return the totals, {metric name: series}
+def collect_relayed_metrics():
+    relay_metrics()
+    # The transaction keeps two workers scraped at once from adding the same totals twice
+    with metrics_store.transact():
+        totals = metrics_store.get('totals', {})
+        while True:
+            try:
+                relayed = metrics_relay.popleft()
+            except IndexError:
+                break
+            for metric in metrics:
+                metric.merge(totals.setdefault(metric.name, {}), relayed.get(metric.name, {}))
+        metrics_store['totals'] = totals
+    return totals
+
+# Background callbacks are dispatched by one request and delivered by a later poll, which another worker
+# may answer. The dispatch time and view of each job are kept in the metrics store under its cache key.
+BACKGROUND_JOB_EXPIRE = BACKGROUND_RESULT_EXPIRE
+
+# Function to get the name of the callback being answered by the current request
+def current_callback():
+    if flask.has_request_context():
+        return getattr(flask.g, 'metrics_callback', 'none')
+    return 'none'
+
+# Function to get the view requested from the callback being answered, 'none' for callbacks without a view
+def current_view():
+    if flask.has_request_context():
+        return getattr(flask.g, 'metrics_view', 'none')
+    return 'none'
+
+# Function to read the view of a callback request from its view request input ({page}-view-request)
+def request_view(body):
+    for item in body.get('inputs', []):
+        if isinstance(item, dict) and str(item.get('id', '')).endswith('-view-request') and isinstance(item.get('value'), dict):
+            return item['value'].get('button') or 'none'
+    return 'none'
+
+# Function to time a function as a named stage (deserialise, filter, expand, render) of the current callback
+def timed(stage):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stage_latency.observe((current_callback(), current_view(), stage), time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+# Function to time the body of a Dash callback; placed below @app.callback.
+# In a background callback process the metrics of the callback are relayed when it returns.
+def instrumented_callback(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            callback_latency.observe((func.__name__, current_view()), end - start)
+            if flask.has_request_context():
+                flask.g.metrics_callback_end = end
+            if background_process:
+                relay_metrics()
+    return wrapper
+
+@server.before_request
+# Function to note the callback answered by a request and when the request started
+def start_request_metrics():
+    if flask.request.path.endswith('/_dash-update-component'):
+        flask.g.metrics_start = time.perf_counter()
+        body = flask.request.get_json(silent=True) or {}
+        callback = app.callback_map.get(body.get('output'), {}).get('callback')
+        flask.g.metrics_callback = getattr(callback, '__name__', 'unknown')
+        flask.g.metrics_view = request_view(body)
+
+@server.after_request
+# Function to record the latency, serialisation time and payload size of a callback request, then relay them.
+# A background callback answers with a job handle and then with progress polls; its latency is
+# recorded once, from the dispatch to the poll that delivers the result.
+def record_request_metrics(response):
+    start = getattr(flask.g, 'metrics_start', None)
+    if start is None:
+        return response
+    end = time.perf_counter()
+    callback = flask.g.metrics_callback
+    view = flask.g.metrics_view
+    cache_key = flask.request.args.get('cacheKey')
+    if cache_key is not None:
+        # The result is the first poll answered without content or with a 'response' (after the small 'progress')
+        body = response.get_data()[:1024] if not response.direct_passthrough else b''
+        if response.status_code == 204 or b'"response":' in body:
+            dispatched = metrics_store.pop(('job', cache_key), None)
+            if dispatched is not None:
+                dispatch_time, view = dispatched
+                request_latency.observe((callback, view), time.time() - dispatch_time)
+                if not response.direct_passthrough:
+                    response_size.observe((callback, view), len(response.get_data()))
+    elif response.status_code == 200 and not response.direct_passthrough and response.get_data().startswith(b'{"cacheKey":'):
+        # Wall clock time, the poll may be answered by another process
+        metrics_store.set(('job', response.get_json()['cacheKey']), (time.time() - (end - start), view), expire=BACKGROUND_JOB_EXPIRE)
+    else:
+        request_latency.observe((callback, view), end - start)
+        callback_end = getattr(flask.g, 'metrics_callback_end', None)
+        if callback_end is not None:
+            stage_latency.observe((callback, view, 'serialise'), end - callback_end)
+        if not response.direct_passthrough:
+            response_size.observe((callback, view), len(response.get_data()))
+    relay_metrics()
+    return response
+
+@server.route('/metrics')
+# Function to expose the metrics in the Prometheus text format
+def metrics_endpoint():
+    totals = collect_relayed_metrics()
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render(totals.get(metric.name, {})))
+    return flask.Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 logging.getLogger('werkzeug').setLevel(logging.WARNING)
 
 def Navbar():
@@ -57,23 +323,26 @@ def Navbar():
     return layout
 
 # Callback to change link color
-@app.callback(
+app.clientside_callback(
+    """
+    function(pathname) {
+        const course_link_style = {color: 'white', fontSize: 16, textDecoration: 'none'};
+        const location_link_style = {color: 'white', fontSize: 16, textDecoration: 'none'};
+
+        if (pathname === '/page1') {
+            course_link_style.textDecoration = 'underline';
+            course_link_style.color = '#FDF480';
+        } else if (pathname === '/page2') {
+            location_link_style.textDecoration = 'underline';
+            location_link_style.color = '#FDF480';
+        }
+        return [course_link_style, location_link_style];
+    }
+    """,
     Output('course-link', 'style'),
     Output('location-link', 'style'),
     Input('url', 'pathname')
 )
-def update_link_styles(pathname):
-    course_link_style = {"color": "white", "fontSize": 16, "textDecoration": "none"}
-    location_link_style = {"color": "white", "fontSize": 16, "textDecoration": "none"}
-
-    if pathname == '/page1':
-        course_link_style['textDecoration'] = 'underline'
-        course_link_style['color'] = '#FDF480'
-    elif pathname == '/page2':
-        location_link_style['textDecoration'] = 'underline'
-        location_link_style['color'] = '#FDF480'
-
-    return course_link_style, location_link_style
 
 app.layout = Navbar()
 
@@ -100,6 +369,668 @@ tech_team_mapping = {
     'TSO': 'Technical Support Operations'
 }
 
+# Mapping from term codes to term names.
+term_mapping = {
+    4410: "Semester 1",
+    4420: "Semester 2",
+    4405: "Summer School",
+    4415: "Winter School",
+    4433: "Trimester 1",
+    4436: "Trimester 2",
+    4439: "Trimester 3",
+    4448: "Term 4"
+}
+
+# Function to expand every section into its weekly class occurrences.
+# Returns one row per section and date with the section's row label and the class start/end datetimes.
+def build_occurrences(df):
+    start_dates = df['Start Date'].values.astype('datetime64[D]')
+    end_dates = df['End Date'].values.astype('datetime64[D]')
+    meeting_start = df['Meeting Start'].values
+    meeting_end = df['Meeting End'].values
+    valid = ~(np.isnat(start_dates) | np.isnat(end_dates) | np.isnat(meeting_start) | np.isnat(meeting_end))
+
+    # 1970-01-01 was a Thursday, so the weekday of a datetime64[D] is (days + 3) % 7
+    start_weekdays = (start_dates.astype('int64') + 3) % 7
+    positions = np.arange(len(df))
+
+    section_positions = []
+    class_dates = []
+    meeting_days = df['Meeting Days'].values if 'Meeting Days' in df.columns else np.zeros(len(df), dtype='uint8')
+    for day, index in weekday_mapping.items():
+        flagged = valid & ((meeting_days >> index) & 1).astype(bool)
+        first_dates = start_dates[flagged] + (index - start_weekdays[flagged]) % 7
+        weeks = np.maximum((end_dates[flagged] - first_dates).astype('int64') // 7 + 1, 0)
+
+        # Repeat each section once per week and offset the first date by the week number
+        week_numbers = np.arange(weeks.sum()) - np.repeat(np.cumsum(weeks) - weeks, weeks)
+        section_positions.append(np.repeat(positions[flagged], weeks))
+        class_dates.append(np.repeat(first_dates, weeks) + week_numbers * np.timedelta64(7, 'D'))
+
+    section_positions = np.concatenate(section_positions) if section_positions else np.array([], dtype='int64')
+    class_dates = np.concatenate(class_dates).astype('datetime64[ns]') if class_dates else np.array([], dtype='datetime64[ns]')
+
+    occurrences = pd.DataFrame({
+        'Section': df.index.values[section_positions],
+        'Start Datetime': class_dates + meeting_start[section_positions],
+        'End Datetime': class_dates + meeting_end[section_positions],
+    })
+    return occurrences.sort_values(['Start Datetime', 'Section'], kind='stable', ignore_index=True)
+
+# Function to join sections with their class occurrences, one row per occurrence
+@timed('expand')
+def explode_occurrences(df, occurrences):
+    section_occurrences = occurrences[occurrences['Section'].isin(df.index)]
+    return section_occurrences.join(df, on='Section', how='inner')
+
+# Inverted index from each filter value to the sorted row positions holding it.
+# Multi-select filters are the union of their postings and filters compose by intersection,
+# so a query costs time proportional to the postings it touches rather than the table size.
+class FilterIndex:
+    filter_columns = ['Term', 'Course Descr', 'Tech Team', 'Building Descr', 'Room', 'Location']
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.postings = {}
+        for column in self.filter_columns:
+            if column not in df.columns:
+                continue
+            # Missing values are indexed under '' which is the value of the "None" dropdown options
+            values = df[column].astype(object).where(df[column].notna(), '')
+            self.postings[column] = pd.Series(np.arange(self.size)).groupby(values.values, sort=False).indices
+
+    # Function to get the sorted row positions holding any of the values of a column
+    def lookup(self, column, values):
+        postings = self.postings.get(column, {})
+        matches = [postings[value] for value in values if value in postings]
+        if not matches:
+            return np.array([], dtype='int64')
+        return np.sort(np.concatenate(matches)) if len(matches) > 1 else matches[0]
+
+    # Function to get the sorted row positions matching every filter, given as {column: selected values}.
+    # Columns without selected values are not filtered.
+    def select(self, filters):
+        row_sets = [self.lookup(column, values) for column, values in filters.items() if values]
+        if not row_sets:
+            return np.arange(self.size)
+        row_sets.sort(key=len)
+        rows = row_sets[0]
+        for other_rows in row_sets[1:]:
+            if len(rows) == 0:
+                break
+            rows = np.intersect1d(rows, other_rows, assume_unique=True)
+        return rows
+
+# Per-room sorted interval index of the class occurrences, for the free room finder.
+# The occurrences are ordered by room and start on one minute axis, rooms one after the other, with the latest
+# end so far in each room. Whether a room is busy in a window is then one binary search: the room is busy when
+# a class starting before the end of the window ends after its start. All rooms are answered in one searchsorted.
+# Section values of the occurrences are the row positions of the sections.
+class RoomIndex:
+    def __init__(self, df, occurrences):
+        if 'Location' not in df.columns:
+            room_codes, room_labels = np.full(len(df), -1), pd.Index([])
+        else:
+            room_codes, room_labels = pd.factorize(df['Location'])
+
+        # One row per room; a room belongs to every tech team with a section in it ('' is no tech team)
+        sections = pd.DataFrame({'Room Code': room_codes, 'Room Capacity': pd.to_numeric(df['Room Capacity'], errors='coerce') if 'Room Capacity' in df.columns else np.nan})
+        sections['Building'] = df['Building Descr'].astype(object).fillna('Unknown') if 'Building Descr' in df.columns else 'Unknown'
+        sections['Tech Team'] = df['Tech Team'].astype(object).where(df['Tech Team'].notna(), '') if 'Tech Team' in df.columns else ''
+        sections = sections[sections['Room Code'] >= 0]
+        self.rooms = sections.groupby('Room Code').agg(**{'Building': ('Building', 'first'), 'Room Capacity': ('Room Capacity', 'max')}).reindex(np.arange(len(room_labels)))
+        self.rooms.insert(1, 'Location', room_labels.astype(str))
+        self.room_tech_teams = sections[['Room Code', 'Tech Team']].drop_duplicates()
+        self.rooms['Tech Team'] = self.room_tech_teams[self.room_tech_teams['Tech Team'] != ''].groupby('Room Code')['Tech Team'].agg(lambda teams: ', '.join(sorted(teams)))
+        self.rooms['Tech Team'] = self.rooms['Tech Team'].fillna('None')
+
+        # The occurrences are sorted by start, a stable sort by room keeps them sorted by start within each room.
+        # Room codes in the smallest unsigned type let numpy use a radix sort for up to 65536 rooms.
+        occurrence_rooms = room_codes[occurrences['Section'].values]
+        located = np.flatnonzero(occurrence_rooms >= 0)
+        order = located[np.argsort(occurrence_rooms[located].astype(np.min_scalar_type(max(len(room_labels) - 1, 0))), kind='stable')]
+        room_offsets = occurrence_rooms[order]
+        starts = occurrences['Start Datetime'].values[order].astype('datetime64[m]').astype(np.int64)
+        ends = occurrences['End Datetime'].values[order].astype('datetime64[m]').astype(np.int64)
+
+        self.origin = starts.min() if len(starts) else 0
+        self.room_span = (ends.max() - self.origin + 1) if len(ends) else 1
+        room_offsets *= self.room_span
+        self.start_keys = room_offsets + (starts - self.origin)
+        # Every room has its own key range above the previous rooms, so one running maximum over all
+        # the end keys restarts at each room
+        self.latest_end_keys = np.maximum.accumulate(room_offsets + (ends - self.origin))
+        self.room_starts = np.searchsorted(self.start_keys, np.arange(len(self.rooms)) * self.room_span)
+
+    # Function to find, for every room, whether it has a class overlapping the window [start, end)
+    def busy_rooms(self, start, end):
+        start = np.datetime64(pd.Timestamp(start), 'm').astype(np.int64)
+        end = np.datetime64(pd.Timestamp(end), 'm').astype(np.int64)
+        room_offsets = np.arange(len(self.rooms)) * self.room_span
+        before_end = np.searchsorted(self.start_keys, room_offsets + np.clip(end - self.origin, 0, self.room_span))
+        has_earlier = before_end > self.room_starts
+        return has_earlier & (self.latest_end_keys[np.maximum(before_end - 1, 0)] > room_offsets + (start - self.origin))
+
+    # Function to get the rooms without a class in any of the windows, with at least min_capacity seats
+    # and, if given, looked after by one of the tech teams
+    def free_rooms(self, windows, min_capacity=None, tech_teams=None):
+        free = np.ones(len(self.rooms), dtype=bool)
+        for start, end in windows:
+            free &= ~self.busy_rooms(start, end)
+        if min_capacity:
+            free &= (self.rooms['Room Capacity'] >= min_capacity).values
+        if tech_teams:
+            team_rooms = self.room_tech_teams.loc[self.room_tech_teams['Tech Team'].isin(tech_teams), 'Room Code']
+            free &= np.isin(np.arange(len(self.rooms)), team_rooms.values)
+        return self.rooms[free].sort_values(['Building', 'Room Capacity', 'Location'], kind='stable', ignore_index=True)
+
+# Function to build the location page filters, the "All" room option selects every room
+def location_filters(selected_terms, selected_tech_teams, selected_buildings, selected_rooms):
+    filters = {
+        'Term': selected_terms,
+        'Tech Team': selected_tech_teams,
+        'Building Descr': selected_buildings,
+    }
+    if selected_rooms != ['All']:
+        filters['Room'] = selected_rooms
+    return filters
+
+# Function to compute the dropdown metadata of a dataset once at upload:
+# terms and their labels, courses and date bounds per term, tech teams and the tech team -> building -> room tree
+def build_metadata(df):
+    terms = df['Term'].dropna().unique().tolist()
+    by_term = df.groupby('Term', sort=False)
+
+    tech_teams = df['Tech Team'].dropna().unique().tolist() if 'Tech Team' in df.columns else []
+
+    # Missing tech teams are kept under '' which is the value of the "None" option
+    locations = df[['Building Descr', 'Room']].assign(**{'Tech Team': df['Tech Team'] if 'Tech Team' in df.columns else None})
+    locations = locations.dropna(subset=['Building Descr']).drop_duplicates()
+    location_tree = {}
+    for building, room, tech_team in locations.itertuples(index=False, name=None):
+        rooms = location_tree.setdefault(tech_team if pd.notna(tech_team) else '', {}).setdefault(building, [])
+        if pd.notna(room):
+            rooms.append(room)
+
+    return {
+        'terms': terms,
+        'term_options': [{'label': term_mapping.get(term, f'Unknown Term {term}'), 'value': term} for term in terms],
+        'term_courses': {term: courses.dropna().unique().tolist() for term, courses in by_term['Course Descr']},
+        'term_dates': {term: (by_term['Start Date'].min()[term], by_term['End Date'].max()[term]) for term in terms},
+        'invalid_date_terms': df.loc[df['Start Date'].isna() | df['End Date'].isna(), 'Term'].unique().tolist(),
+        'tech_teams': tech_teams,
+        'location_tree': location_tree,
+        'min_date': df['Start Date'].min(),
+        'max_date': df['End Date'].max(),
+    }
+
+# Function to get the courses and the allowed date range of the selected terms from the metadata
+def term_summary(metadata, selected_terms):
+    terms = [term for term in selected_terms if term in metadata['term_dates']]
+    courses = list(dict.fromkeys(course for term in terms for course in metadata['term_courses'][term]))
+    min_date = min(metadata['term_dates'][term][0] for term in terms) if terms else None
+    max_date = max(metadata['term_dates'][term][1] for term in terms) if terms else None
+    return courses, min_date, max_date
+
+# Function to lay the occurrence starts of every section on one sorted axis: a section owns the stretch
+# [section * span, (section + 1) * span) and each of its occurrences is the number of seconds from the first start.
+# Whether a section meets between two times is then one binary search.
+def build_section_axis(occurrences):
+    starts = occurrences['Start Datetime'].values
+    if len(starts) == 0:
+        return np.datetime64(0, 's'), 1, np.array([], dtype='int64')
+    origin = starts.min()
+    offsets = (starts - origin) // np.timedelta64(1, 's')
+    span = int(offsets.max()) + 1
+    return origin, span, np.sort(occurrences['Section'].values.astype('int64') * span + offsets)
+
+# An uploaded timetable with everything derived from it at ingest
+class Dataset:
+    def __init__(self, df, occurrences=None):
+        self.df = df
+        self.occurrences = build_occurrences(df) if occurrences is None else occurrences
+        self.filter_index = FilterIndex(df)
+        self.metadata = build_metadata(df)
+        self.room_index = RoomIndex(df, self.occurrences)
+        # The occurrences are sorted by start, so date ranges are answered with a binary search
+        self.occurrence_starts = self.occurrences['Start Datetime'].values
+        self.section_axis_origin, self.section_axis_span, self.section_axis = build_section_axis(self.occurrences)
+
+    # Function to find the positions of the occurrences starting between start and end (inclusive)
+    def occurrence_range(self, start, end):
+        first = np.searchsorted(self.occurrence_starts, np.datetime64(pd.Timestamp(start)), side='left')
+        last = np.searchsorted(self.occurrence_starts, np.datetime64(pd.Timestamp(end)), side='right')
+        return first, last
+
+    # Function to get the occurrences starting between start and end
+    def occurrences_between(self, start, end):
+        first, last = self.occurrence_range(start, end)
+        return self.occurrences.iloc[first:last]
+
+    # Function to keep the sections (sorted row positions) with at least one occurrence starting between start and end.
+    # Each section is one binary search in the section axis, so the cost follows the number of sections
+    # asked about, not the number of occurrences in the range.
+    def sections_between(self, rows, start, end):
+        span = self.section_axis_span
+        second = np.timedelta64(1, 's')
+        first_offset = np.clip(-((np.datetime64(pd.Timestamp(start)) - self.section_axis_origin) // -second), 0, span)
+        last_offset = np.clip((np.datetime64(pd.Timestamp(end)) - self.section_axis_origin) // second, -1, span - 1)
+        rows = np.asarray(rows, dtype='int64')
+        positions = np.searchsorted(self.section_axis, rows * span + first_offset, side='left')
+        found = positions < len(self.section_axis)
+        found[found] = self.section_axis[positions[found]] <= rows[found] * span + last_offset
+        return rows[found]
+
+    # Function to get the row positions of the sections matching the filters and, if given,
+    # with an occurrence between start and end
+    def matching_rows(self, filters, start=None, end=None):
+        rows = self.filter_index.select(filters)
+        if start is not None and end is not None:
+            rows = self.sections_between(rows, start, end)
+        return rows
+
+    # Function to get the sections matching the filters and, if given, with an occurrence between start and end.
+    # With columns, only those columns of the matching rows are copied out of the shared frame.
+    @timed('filter')
+    def select(self, filters, start=None, end=None, columns=None):
+        rows = self.matching_rows(filters, start, end)
+        if columns is None:
+            return self.df.iloc[rows]
+        return self.df.iloc[rows, self.df.columns.get_indexer([column for column in columns if column in self.df.columns])]
+
+# Server-side registry of uploaded datasets keyed by upload ID.
+# The browser only keeps the upload ID in 'stored-data'; the parsed dataset stays in process memory.
+DATASET_CACHE_SIZE = int(os.getenv('DATASET_CACHE_SIZE', 8))
+dataset_registry = OrderedDict()
+dataset_registry_lock = threading.Lock()
+
+# Function to register a parsed dataset and return its upload ID
+def register_dataset(dataset, upload_id=None):
+    if upload_id is None:
+        upload_id = uuid.uuid4().hex
+    with dataset_registry_lock:
+        dataset_registry[upload_id] = dataset
+        # Evict the least recently used datasets
+        while len(dataset_registry) > DATASET_CACHE_SIZE:
+            evicted_id, _ = dataset_registry.popitem(last=False)
+            logging.info(f"Dataset {evicted_id} evicted from the registry.")
+    return upload_id
+
+# Function to resolve an upload ID to its dataset, None if unknown or evicted
+@timed('deserialise')
+def get_dataset(upload_id):
+    if not upload_id:
+        return None
+    with dataset_registry_lock:
+        dataset = dataset_registry.get(upload_id)
+        if dataset is not None:
+            dataset_registry.move_to_end(upload_id)
+    if dataset is None:
+        # Upload IDs are content hashes, so a dataset evicted from memory (or lost on restart)
+        # can still be reloaded from the parse cache
+        dataset = load_cached_dataset(upload_id)
+        if dataset is not None:
+            register_dataset(dataset, upload_id)
+    return dataset
+
+# On-disk cache of parsed uploads keyed by the hash of the uploaded file.
+# Each entry is the typed timetable and its occurrence table stored as Parquet.
+PARSE_CACHE_DIR = os.getenv('PARSE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.parse_cache'))
+PARSE_CACHE_SIZE_MB = int(os.getenv('PARSE_CACHE_SIZE_MB', 512))
+parse_cache_lock = threading.Lock()
+
+# Function to hash the uploaded bytes; csv and Excel files are parsed differently, so the reader is part of the key
+def upload_key(decoded, filename):
+    reader = 'csv' if 'csv' in filename else 'excel'
+    return hashlib.sha256(decoded).hexdigest()[:32] + '-' + reader
+
+# Version of the cached timetable layout; entries written by older versions are not read and age out
+PARSE_CACHE_FORMAT = 2
+
+# Function to get the file paths of a parse cache entry
+def parse_cache_paths(key):
+    return os.path.join(PARSE_CACHE_DIR, f"{key}.v{PARSE_CACHE_FORMAT}.timetable.parquet"), os.path.join(PARSE_CACHE_DIR, f"{key}.v{PARSE_CACHE_FORMAT}.occurrences.parquet")
+
+# Function to load a dataset from the parse cache, None if it is not cached
+def load_cached_dataset(key):
+    # Keys come from the browser, only accept the ones upload_key can produce
+    if not re.fullmatch(r'[0-9a-f]{32}-(csv|excel)', key):
+        return None
+    timetable_path, occurrences_path = parse_cache_paths(key)
+    try:
+        df = pd.read_parquet(timetable_path)
+        occurrences = pd.read_parquet(occurrences_path)
+        # Touch the entry so eviction drops the least recently used uploads first
+        os.utime(timetable_path)
+        os.utime(occurrences_path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Could not read parse cache entry {key}: {e}")
+        return None
+    logging.info(f"Dataset {key} loaded from the parse cache.")
+    return Dataset(df, occurrences)
+
+# Function to write a dataset to the parse cache and evict old entries beyond the size cap
+def save_cached_dataset(key, dataset):
+    timetable_path, occurrences_path = parse_cache_paths(key)
+    try:
+        os.makedirs(PARSE_CACHE_DIR, exist_ok=True)
+        # Write to temporary files first so readers never see a partial entry
+        for frame, path in [(dataset.df, timetable_path), (dataset.occurrences, occurrences_path)]:
+            temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            frame.to_parquet(temporary_path)
+            os.replace(temporary_path, path)
+    except Exception as e:
+        logging.warning(f"Could not write parse cache entry {key}: {e}")
+        return
+    evict_parse_cache()
+
+# Function to remove the least recently used parse cache entries until the cache fits its size cap.
+# The upload published to the calendar feeds is kept however long ago it was last read.
+def evict_parse_cache():
+    published_upload = published_feed()[0]
+    with parse_cache_lock:
+        entries = {}
+        for name in os.listdir(PARSE_CACHE_DIR):
+            if not name.endswith('.parquet'):
+                continue
+            path = os.path.join(PARSE_CACHE_DIR, name)
+            stat = os.stat(path)
+            # Files of older cache formats are grouped with their key and age out with it
+            key = name.split('.', 1)[0]
+            size, last_used, paths = entries.get(key, (0, 0, []))
+            entries[key] = (size + stat.st_size, max(last_used, stat.st_mtime), paths + [path])
+        total_size = sum(size for size, _, _ in entries.values())
+        for key, (size, _, paths) in sorted(entries.items(), key=lambda entry: entry[1][1]):
+            if total_size <= PARSE_CACHE_SIZE_MB * 1024 * 1024:
+                break
+            if key == published_upload:
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total_size -= size
+            logging.info(f"Parse cache entry {key} evicted.")
+
+# Occurrences read per chunk by the exports. Memory use follows the chunk size, not the size of the selection.
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 50000))
+
+# Columns of the sections written with each exported occurrence, in file order
+export_columns = ['Term', 'Course Descr', 'Subject / Catalogue', 'Component', 'Class Nbr', 'Pattern Nbr', 'Location', 'Tech Team', 'Enrl Capacity', 'Room Capacity']
+
+# Most rows of an Excel sheet, the header included
+excel_max_rows = 1048576
+
+# Function to turn the selection of a course or location page into filters and a date range.
+# The selection comes from the query string, a ValueError says what is wrong with it.
+def export_selection(page, selection):
+    for key in ['terms', 'courses', 'tech_teams', 'buildings', 'rooms']:
+        if not isinstance(selection.get(key), (list, type(None))):
+            raise ValueError(f"The {key} of the selection must be a list.")
+
+    start_date = end_date = None
+    if selection.get('start_date') and selection.get('end_date'):
+        try:
+            start_date = pd.to_datetime(str(selection['start_date'])).replace(hour=0, minute=0, second=0)
+            end_date = pd.to_datetime(str(selection['end_date'])).replace(hour=23, minute=59, second=59)
+        except (ValueError, OverflowError):
+            raise ValueError("The start and end dates of the selection must be dates such as 2024-02-26.")
+        if pd.isna(start_date) or pd.isna(end_date):
+            raise ValueError("The start and end dates of the selection must be dates such as 2024-02-26.")
+        if start_date > end_date:
+            raise ValueError("The start date of the selection is after its end date.")
+
+    if page == 'location':
+        selected_buildings = selection.get('buildings')
+        filters = location_filters(selection.get('terms'), selection.get('tech_teams'), selected_buildings, selection.get('rooms') if selected_buildings else None)
+    else:
+        filters = {'Term': selection.get('terms'), 'Course Descr': selection.get('courses')}
+    return filters, start_date, end_date
+
+# Function to read the occurrences of the sections matching the filters in chunks, in start order, joined with
+# their export columns. The occurrence table is walked a slice at a time, so no chunk is larger than
+# EXPORT_CHUNK_SIZE whatever the selection; at least one chunk is given, empty when nothing matches.
+def export_chunks(dataset, filters, start_date=None, end_date=None):
+    selected = np.zeros(len(dataset.df), dtype=bool)
+    selected[dataset.matching_rows(filters, start_date, end_date)] = True
+    occurrences = dataset.occurrences_between(start_date, end_date) if start_date is not None else dataset.occurrences
+    columns = dataset.df.columns.get_indexer([column for column in export_columns if column in dataset.df.columns])
+
+    empty = True
+    for first in range(0, len(occurrences), EXPORT_CHUNK_SIZE):
+        chunk = occurrences.iloc[first:first + EXPORT_CHUNK_SIZE]
+        chunk = chunk[selected[chunk['Section'].values]]
+        if len(chunk) or (empty and first + EXPORT_CHUNK_SIZE >= len(occurrences)):
+            empty = False
+            rows = dataset.df.iloc[chunk['Section'].values, columns].reset_index(drop=True)
+            yield rows.assign(**{'Start Datetime': chunk['Start Datetime'].values, 'End Datetime': chunk['End Datetime'].values})
+    if empty:
+        yield dataset.df.iloc[:0, columns].assign(**{'Start Datetime': pd.Series(dtype='datetime64[ns]'), 'End Datetime': pd.Series(dtype='datetime64[ns]')})
+
+# Function to write the chunks as CSV text, one block per chunk
+def csv_export(chunks):
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header, date_format='%Y-%m-%d %H:%M')
+        header = False
+
+# Function to write the chunks as an Excel workbook. The write-only workbook keeps its rows in a temporary
+# file rather than in memory; a new sheet is started when one is full. The zipped workbook is sent in blocks.
+def xlsx_export(chunks):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = None
+    for chunk in chunks:
+        if sheet is None:
+            sheet, sheet_rows = workbook.create_sheet('Occurrences'), 0
+        for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+            if sheet_rows == 0:
+                sheet.append(list(chunk.columns))
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+            if sheet_rows == excel_max_rows:
+                sheet, sheet_rows = workbook.create_sheet(f"Occurrences {len(workbook.worksheets) + 1}"), 0
+        if sheet_rows == 0:
+            sheet.append(list(chunk.columns))
+            sheet_rows = 1
+
+    with tempfile.TemporaryFile() as workbook_file:
+        workbook.save(workbook_file)
+        workbook_file.seek(0)
+        for block in iter(functools.partial(workbook_file.read, 1 << 16), b''):
+            yield block
+
+# Function to escape a text value of an iCalendar property
+def ics_text(value):
+    return str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+# Function to end an iCalendar content line, folded into lines of at most 75 octets
+def ics_line(line):
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    lines = []
+    while encoded:
+        # Never split inside a UTF-8 character; continuation lines start with a space
+        cut = 75 if not lines else 74
+        if cut < len(encoded):
+            while encoded[cut] & 0xC0 == 0x80:
+                cut -= 1
+        lines.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    return '\r\n '.join(lines) + '\r\n'
+
+# Function to write the chunks as the VEVENTs of one iCalendar file, one event per occurrence.
+# Times are floating local times, like the timetable. An event is identified by its term, class,
+# meeting pattern and start, so it keeps its UID in every export and feed of the same class.
+def ics_export(chunks, calendar_name, stamp):
+    yield ''.join(ics_line(line) for line in [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//SET Lab//Management Tool//EN', 'CALSCALE:GREGORIAN',
+        'X-WR-CALNAME:' + ics_text(calendar_name),
+    ])
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        text = {column: display_text(chunk[column]) if column in chunk.columns else pd.Series('None', index=chunk.index) for column in export_columns}
+        starts = chunk['Start Datetime'].dt.strftime('%Y%m%dT%H%M%S')
+        uids = text['Term'] + '-' + text['Class Nbr'] + '-' + text['Pattern Nbr'] + '-' + starts + '@setlab'
+        summaries = (text['Subject / Catalogue'] + ' ' + text['Component'] + ' - ' + text['Course Descr']).map(ics_text)
+        locations = text['Location'].map(ics_text)
+        descriptions = ('Class ' + text['Class Nbr'] + ', Tech Team: ' + text['Tech Team'] + ', Enrol Capacity: ' + text['Enrl Capacity'] + ', Room Capacity: ' + text['Room Capacity']).map(ics_text)
+        yield ''.join(
+            'BEGIN:VEVENT\r\n' + ics_line('UID:' + uid) + f'DTSTAMP:{stamp}\r\nDTSTART:{start}\r\nDTEND:{end}\r\n'
+            + ics_line('SUMMARY:' + summary) + ics_line('LOCATION:' + location) + ics_line('DESCRIPTION:' + description) + 'END:VEVENT\r\n'
+            for uid, start, end, summary, location, description
+            in zip(uids, starts, chunk['End Datetime'].dt.strftime('%Y%m%dT%H%M%S'), summaries, locations, descriptions)
+        )
+    yield 'END:VCALENDAR\r\n'
+
+# Export formats: file type and the writer of the chunks
+export_formats = {
+    'csv': ('text/csv', csv_export),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', xlsx_export),
+    'ics': ('text/calendar', lambda chunks: ics_export(chunks, 'SET Lab timetable', time.strftime('%Y%m%dT%H%M%SZ', time.gmtime()))),
+}
+
+@server.route('/export/<export_format>')
+# Function to stream the occurrences of a page selection as a CSV, Excel or iCalendar download.
+# The selection is the one shown on the page, the file is written chunk by chunk while it is sent.
+def export_endpoint(export_format):
+    if export_format not in export_formats:
+        flask.abort(404)
+    dataset = get_dataset(flask.request.args.get('upload_id'))
+    if dataset is None:
+        return flask.Response('The uploaded file is no longer available, please upload it again.\n', status=404, mimetype='text/plain')
+    try:
+        selection = json.loads(flask.request.args.get('selection') or '{}')
+    except ValueError:
+        flask.abort(400)
+    if not isinstance(selection, dict):
+        flask.abort(400)
+
+    try:
+        filters, start_date, end_date = export_selection(flask.request.args.get('page'), selection)
+    except ValueError as e:
+        return flask.Response(f'{e}\n', status=400, mimetype='text/plain')
+    mimetype, write = export_formats[export_format]
+    logging.info(f"Exporting {export_format} of dataset {flask.request.args.get('upload_id')}.")
+    return flask.Response(
+        write(export_chunks(dataset, filters, start_date, end_date)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="setlab_export.{export_format}"'},
+    )
+
+# Calendar feeds. Feed URLs name a room, course or tech team and stay the same from one upload to the next;
+# they serve the timetable last published with the Publish Calendar Feeds button, whose upload ID and
+# publication time are kept in a small file next to the parse cache so every worker (and a restarted server)
+# serves the same one.
+FEED_PUBLISH_PATH = os.path.join(PARSE_CACHE_DIR, 'published_feed')
+FEED_CACHE_SIZE_MB = int(os.getenv('FEED_CACHE_SIZE_MB', 64))
+# Version of the feed layout, part of every ETag so clients refetch when the layout changes
+FEED_FORMAT = 1
+feed_kinds = {'room': 'Location', 'course': 'Course Descr', 'tech-team': 'Tech Team'}
+feed_cache = OrderedDict()
+feed_cache_lock = threading.Lock()
+
+# Function to publish an upload as the timetable of the calendar feeds, False if it could not be written.
+# Publishing the upload that is already published keeps its publication time, so the feeds and their ETags do not change.
+def publish_feed(upload_id):
+    if published_feed()[0] == upload_id:
+        return True
+    try:
+        os.makedirs(PARSE_CACHE_DIR, exist_ok=True)
+        temporary_path = f"{FEED_PUBLISH_PATH}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_path, 'w') as feed_file:
+            feed_file.write(f"{upload_id}\n{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}\n")
+        os.replace(temporary_path, FEED_PUBLISH_PATH)
+    except OSError as e:
+        logging.warning(f"Could not publish upload {upload_id} to the calendar feeds: {e}")
+        return False
+    return True
+
+# Function to get the upload ID and publication time of the feed timetable, (None, None) if none is published
+def published_feed():
+    try:
+        with open(FEED_PUBLISH_PATH) as feed_file:
+            upload_id, stamp = feed_file.read().split()
+    except (OSError, ValueError):
+        return None, None
+    return upload_id, stamp
+
+# Function to derive the strong ETag of a feed. A feed is a function of the published upload, so the hash of
+# the uploaded file, its publication time (the DTSTAMP of the events) and the feed name identify its bytes.
+def feed_etag(upload_id, stamp, kind, feed_name):
+    return hashlib.sha256(f"{upload_id}\n{stamp}\n{kind}\n{feed_name}\n{FEED_FORMAT}".encode('utf-8')).hexdigest()[:32]
+
+# Function to build the iCalendar file of a feed, None if the timetable has no such room, course or tech team
+def render_feed(dataset, kind, feed_name, stamp):
+    column = feed_kinds[kind]
+    if feed_name not in dataset.filter_index.postings.get(column, {}):
+        return None
+    chunks = export_chunks(dataset, {column: [feed_name]})
+    return ''.join(ics_export(chunks, f"SET Lab - {feed_name}", stamp)).encode('utf-8')
+
+# Function to get a rendered feed from the feed cache, or render and cache it.
+# The cache is least recently used first out, capped by the size of the feeds.
+def cached_feed(etag, render):
+    with feed_cache_lock:
+        body = feed_cache.get(etag)
+        if body is not None:
+            feed_cache.move_to_end(etag)
+            return body
+    body = render()
+    if body is not None:
+        with feed_cache_lock:
+            feed_cache[etag] = body
+            total_size = sum(len(cached_body) for cached_body in feed_cache.values())
+            while total_size > FEED_CACHE_SIZE_MB * 1024 * 1024 and len(feed_cache) > 1:
+                _, evicted_body = feed_cache.popitem(last=False)
+                total_size -= len(evicted_body)
+    return body
+
+@server.route('/feeds/<kind>/<path:feed_name>.ics')
+# Function to serve the calendar feed of a room, course or tech team. Calendar clients poll feeds,
+# so a request whose If-None-Match holds the current ETag is answered 304 before the dataset is looked at.
+def feed_endpoint(kind, feed_name):
+    if kind not in feed_kinds:
+        flask.abort(404)
+    upload_id, stamp = published_feed()
+    if upload_id is None:
+        return flask.Response('No timetable has been published yet.\n', status=404, mimetype='text/plain')
+
+    etag = feed_etag(upload_id, stamp, kind, feed_name)
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if etag in flask.request.if_none_match:
+        return flask.Response(status=304, headers=headers)
+
+    dataset = get_dataset(upload_id)
+    if dataset is None:
+        return flask.Response('The uploaded timetable is no longer available, please upload it again.\n', status=404, mimetype='text/plain')
+    body = cached_feed(etag, lambda: render_feed(dataset, kind, feed_name, stamp))
+    if body is None:
+        flask.abort(404)
+    return flask.Response(body, mimetype='text/calendar', headers=headers)
+
+@server.route('/feeds')
+# Function to list the feed URLs of every room, course and tech team of the published timetable
+def feed_index():
+    upload_id, _ = published_feed()
+    dataset = get_dataset(upload_id)
+    if dataset is None:
+        return flask.Response('No timetable has been published yet.\n', status=404, mimetype='text/plain')
+    lines = []
+    for kind, column in feed_kinds.items():
+        names = sorted(name for name in dataset.filter_index.postings.get(column, {}) if name != '')
+        lines.extend(flask.url_for('feed_endpoint', kind=kind, feed_name=str(name), _external=True) for name in names)
+    return flask.Response('\n'.join(lines) + '\n', mimetype='text/plain')
+
+# Styles of the progress bars shown while a background render is running
+progress_bar_hidden = {'display': 'none'}
+progress_bar_visible = {'display': 'block', 'width': '60%', 'margin': '10px auto'}
+
 # Layout of the app
 app.layout = html.Div(style={'backgroundColor': '#262B3D', 'color':'white'}, children=[
     Navbar(),
@@ -119,6 +1050,12 @@ app.layout = html.Div(style={'backgroundColor': '#262B3D', 'color':'white'}, chi
             ),
         ),
         html.Button('Reset', id='reset-button', n_clicks=0, style={'background-color': '#3b405c', 'color': 'white', 'margin-left': '60px', 'margin-bottom': '10px', 'fontSize': 16}),
+        dcc.ConfirmDialogProvider(
+            html.Button('Publish Calendar Feeds', style={'background-color': '#3b405c', 'color': 'white', 'margin-left': '20px', 'margin-bottom': '10px', 'fontSize': 16}),
+            id='publish-feeds-confirm',
+            message='Publish the uploaded timetable to the calendar feeds? Everyone subscribed to a room, course or tech team feed will see it.',
+        ),
+        html.Span(id='publish-feeds-status', style={'margin-left': '20px', 'fontSize': 16}),
     ]),
 
     # Container for the term/course selection 
@@ -143,6 +1080,22 @@ app.layout = html.Div(style={'backgroundColor': '#262B3D', 'color':'white'}, chi
             dbc.Tooltip("A Gantt chart showing information related to the timelines of classes within a selected date range", 
                         target="show-timeline",
                         style={"border": "2px solid lightblue",'fontSize': 14}),
+            dbc.Button('Capacity', id='show-capacity',  n_clicks=0, outline=True, color="light", className="mr-3", style={'margin-right': '10px','margin-bottom': '20px', 'background-color': '#3b405c', 'color': 'white', 'fontSize': 16}),
+            dbc.Tooltip("One chart comparing enrolment with room capacity for every class, over capacity classes first", 
+                        target="show-capacity",
+                        style={"border": "2px solid lightblue",'fontSize': 14}),
+            dbc.Button('Utilisation', id='show-utilisation',  n_clicks=0, outline=True, color="light", className="mr-3", style={'margin-right': '10px','margin-bottom': '20px', 'background-color': '#3b405c', 'color': 'white', 'fontSize': 16}),
+            dbc.Tooltip("A heatmap of how busy every room is in 15 minute slots, with a row per building (location page)", 
+                        target="show-utilisation",
+                        style={"border": "2px solid lightblue",'fontSize': 14}),
+            dbc.Button('Conflicts', id='show-conflicts',  n_clicks=0, outline=True, color="light", className="mr-3", style={'margin-right': '10px','margin-bottom': '20px', 'background-color': '#3b405c', 'color': 'white', 'fontSize': 16}),
+            dbc.Tooltip("Classes of different sections booked into the same room at the same time, with a downloadable report (location page)", 
+                        target="show-conflicts",
+                        style={"border": "2px solid lightblue",'fontSize': 14}),
+            dbc.Button('Workload', id='show-workload',  n_clicks=0, outline=True, color="light", className="mr-3", style={'margin-right': '10px','margin-bottom': '20px', 'background-color': '#3b405c', 'color': 'white', 'fontSize': 16}),
+            dbc.Tooltip("Contact hours, sessions, rooms and peak concurrent sessions of every tech team per week or day (location page)", 
+                        target="show-workload",
+                        style={"border": "2px solid lightblue",'fontSize': 14}),
         ]),
     ], style={'textAlign': 'center', 'justify-content': 'space-between', "fontSize": 16, 'background-color': '#262B3D', 'color': 'white'}),
     html.Div(id='toggle-state', children='pie', style={'display': 'none', 'background-color': '#262B3D', 'color': 'white'}),
@@ -156,6 +1109,9 @@ app.layout = html.Div(style={'backgroundColor': '#262B3D', 'color':'white'}, chi
         dcc.Dropdown(id='location-dropdown'),  
     ], style={'display': 'none'}, id='location-dropdown-container'),  
 
+    html.Progress(id='course-progress', value=0, max=1, style=progress_bar_hidden),
+    html.Progress(id='location-progress', value=0, max=1, style=progress_bar_hidden),
+
     dcc.Loading(
         id="loading-output-div",
         type="default",
@@ -171,10 +1127,12 @@ app.layout = html.Div(style={'backgroundColor': '#262B3D', 'color':'white'}, chi
     html.Div(id='stored-data', style={'display': 'none'}),
     html.Div([
     dcc.Store(id='current-month', storage_type='session', data={'date': datetime.now().strftime('%Y-%m-01')}),
+    # Output of the calendar prefetch, which only fills the server cache
+    dcc.Store(id='calendar-prefetch'),
     
     html.Div(id='calendar-view'),
     ]),
-    dcc.Store(id='last-clicked-button', data={'button': None}),
+    dcc.Store(id='last-clicked-button', data={'button': None, 'clicks': 0}),
 
     dbc.Modal(
         [
@@ -194,39 +1152,61 @@ app.layout = html.Div(style={'backgroundColor': '#262B3D', 'color':'white'}, chi
 ])
 
 # Callback to change font color to yellow when button is clicked
-@app.callback(
+app.clientside_callback(
+    """
+    function(pie_clicks, table_clicks, calendar_clicks, timeline_clicks, capacity_clicks, utilisation_clicks, conflicts_clicks, workload_clicks) {
+        const buttons = ['show-pie-chart', 'show-table', 'show-calendar', 'show-timeline', 'show-capacity', 'show-utilisation', 'show-conflicts', 'show-workload'];
+        const triggered = dash_clientside.callback_context.triggered;
+        const button_id = triggered.length ? triggered[0].prop_id.split('.')[0] : null;
+
+        return buttons.map(function(button) {
+            if (button === button_id) {
+                return {'background-color': '#3b405c', 'color': '#FDF480', 'textDecoration': 'underline', 'fontSize': 16, 'margin-bottom': '20px'};
+            }
+            return {'background-color': '#3b405c', 'color': 'white', 'fontSize': 16, 'margin-bottom': '20px'};
+        });
+    }
+    """,
     [Output('show-pie-chart', 'style'),
      Output('show-table', 'style'),
      Output('show-calendar', 'style'),
-     Output('show-timeline', 'style')],
+     Output('show-timeline', 'style'),
+     Output('show-capacity', 'style'),
+     Output('show-utilisation', 'style'),
+     Output('show-conflicts', 'style'),
+     Output('show-workload', 'style')],
     [Input('show-pie-chart', 'n_clicks'),
      Input('show-table', 'n_clicks'),
      Input('show-calendar', 'n_clicks'),
-     Input('show-timeline', 'n_clicks')]
+     Input('show-timeline', 'n_clicks'),
+     Input('show-capacity', 'n_clicks'),
+     Input('show-utilisation', 'n_clicks'),
+     Input('show-conflicts', 'n_clicks'),
+     Input('show-workload', 'n_clicks')]
 )
-def update_button_styles(pie_clicks, table_clicks, calendar_clicks, timeline_clicks):
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        button_id = None
-    else:
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    
-    button_styles = [{'background-color': '#3b405c', 'color': 'white', 'fontSize': 16, 'margin-bottom': '20px'}, {'background-color': '#3b405c', 'color': 'white', 'fontSize': 16, 'margin-bottom': '20px'}, 
-                    {'background-color': '#3b405c', 'color': 'white', 'fontSize': 16, 'margin-bottom': '20px'}, {'background-color': '#3b405c', 'color': 'white', 'fontSize': 16, 'margin-bottom': '20px'}]
-
-    if button_id == 'show-pie-chart':
-        button_styles[0] = {'background-color': '#3b405c', 'color': '#FDF480', 'textDecoration': 'underline', 'fontSize': 16, 'margin-bottom': '20px'}
-    elif button_id == 'show-table':
-        button_styles[1] = {'background-color': '#3b405c', 'color': '#FDF480', 'textDecoration': 'underline', 'fontSize': 16, 'margin-bottom': '20px'}
-    elif button_id == 'show-calendar':
-        button_styles[2] = {'background-color': '#3b405c', 'color': '#FDF480', 'textDecoration': 'underline', 'fontSize': 16, 'margin-bottom': '20px'}
-    elif button_id == 'show-timeline':
-        button_styles[3] = {'background-color': '#3b405c', 'color': '#FDF480', 'textDecoration': 'underline', 'fontSize': 16, 'margin-bottom': '20px'}
-    
-    return button_styles
 
 # Callback feedback alert
-@app.callback(
+app.clientside_callback(
+    """
+    function(filename, is_open) {
+        if (!filename) {
+            throw dash_clientside.PreventUpdate;
+        }
+
+        const file_extension = filename.split('.').pop().toLowerCase();
+        if (['xlsx', 'xls'].includes(file_extension)) {
+            return [false, '', ''];
+        }
+
+        const feedback_message = [
+            'Unsupported file type.',
+            {namespace: 'dash_html_components', type: 'Br', props: {}},
+            'Please upload the excel spreadsheet.'
+        ];
+        const modal_header_content = {namespace: 'dash_html_components', type: 'H4', props: {children: 'Warning', style: {'font-size': '24px'}}};
+        return [true, feedback_message, modal_header_content];
+    }
+    """,
     [
         Output("modal-feedback", "is_open"),
         Output("modal-body", "children"),
@@ -235,26 +1215,11 @@ def update_button_styles(pie_clicks, table_clicks, calendar_clicks, timeline_cli
     [Input("upload-data", "filename")],
     [State("modal-feedback", "is_open")]
 )
-def file_feedback(filename, is_open):
-    if not filename:
-        raise PreventUpdate
 
-    file_extension = filename.split('.')[-1]
-    if file_extension.lower() in ['xlsx', 'xls']:
-        return False, "", ""
-    
-    else:
-        feedback_message = [
-            "Unsupported file type.",
-            html.Br(),
-            "Please upload the excel spreadsheet."
-        ]
-        modal_header_content = html.H4("Warning", style={'font-size': '24px'})
-        return True, feedback_message, modal_header_content
-    
 # call back for select course/location page
 @app.callback(Output('page-content', 'children'),
               [Input('url', 'pathname')])
+@instrumented_callback
 def display_page(pathname):
     if pathname == '/page2':
         return location_selection_layout()  
@@ -262,7 +1227,7 @@ def display_page(pathname):
         return course_selection_layout()
 
 def course_selection_layout():
-    return html.Div(
+    return html.Div([html.Div(
         children=[
             html.Div(
                 children=[
@@ -290,12 +1255,14 @@ def course_selection_layout():
                 style={'width': '20%'}
             ),
             html.Div(id='output-container-date-picker-single'),
+            dcc.Store(id='course-selection'),
+            dcc.Store(id='course-view-request'),
         ],
         style={'display': 'flex', 'justify-content': 'space-between', 'color': 'black'}
-    )
+    ), export_links('course')])
 
 def location_selection_layout():
-    return html.Div(
+    return html.Div([html.Div(
         children=[
             html.Div(
                 children=[
@@ -336,25 +1303,166 @@ def location_selection_layout():
                 ],
                 style={'width': '20%'}
             ),
+            dcc.Store(id='location-selection'),
+            dcc.Store(id='location-view-request'),
         ],
         style={'display': 'flex', 'justify-content': 'space-between', 'color': 'black'}
+    ), export_links('location'), free_room_panel()])
+
+# Function to lay out the export links of a page. Their addresses are set from the page selection;
+# they stay hidden until a term is selected. The feed list links to the calendar feed of every room, course and tech team.
+def export_links(page):
+    link_style = {'background-color': '#3b405c', 'color': 'white', 'fontSize': 16, 'padding': '6px 12px', 'margin-right': '10px', 'text-decoration': 'none'}
+    return html.Div(
+        id=f'{page}-export-links',
+        children=[html.Label('Export:', style={"fontSize": 16, 'color': 'white', 'margin-right': '10px'})] + [
+            html.A(label, id=f'{page}-export-{export_format}', download=f'setlab_export.{export_format}', style=link_style)
+            for export_format, label in [('csv', 'CSV'), ('xlsx', 'Excel'), ('ics', 'Calendar (.ics)')]
+        ] + [html.A('Calendar Feeds', href='/feeds', target='_blank', style=link_style)],
+        style={'display': 'none'},
     )
 
+# Function to lay out the free room finder of the location page. It uses the tech teams, terms and
+# date range selected above it.
+def free_room_panel():
+    label_style = {"fontSize": 16, 'color': 'white'}
+    # Times of day offered, every 15 minutes of the timetable day
+    free_room_times = pd.date_range('1900-01-01 %02d:00' % utilisation_day_start, '1900-01-01 %02d:00' % utilisation_day_end, freq='15min').strftime('%H:%M').tolist()
+    return html.Div([html.Div(
+        children=[
+            html.Div([
+                html.Label('Free Room On:', style=label_style),
+                dcc.DatePickerSingle(id='free-room-date', placeholder='Date'),
+            ], style={'margin-left': '60px', 'margin-right': '20px'}),
+            html.Div([
+                html.Label('Or Every:', style=label_style),
+                dcc.Dropdown(id='free-room-weekday', placeholder='Weekday',
+                             options=[{'label': calendar.day_name[weekday], 'value': weekday} for weekday in range(7)]),
+            ], style={'margin-right': '20px', 'width': '12%'}),
+            html.Div([
+                html.Label('From:', style=label_style),
+                dcc.Dropdown(id='free-room-start', placeholder='Start', options=free_room_times),
+            ], style={'margin-right': '20px', 'width': '10%'}),
+            html.Div([
+                html.Label('To:', style=label_style),
+                dcc.Dropdown(id='free-room-end', placeholder='End', options=free_room_times),
+            ], style={'margin-right': '20px', 'width': '10%'}),
+            html.Div([
+                html.Label('Min. Capacity:', style=label_style),
+                dcc.Input(id='free-room-capacity', type='number', min=0, placeholder='Seats', style={'height': '36px'}),
+            ], style={'margin-right': '20px'}),
+            html.Button('Find Free Room', id='free-room-button', n_clicks=0,
+                        style={'background-color': '#3b405c', 'color': 'white', 'fontSize': 16, 'height': '38px', 'align-self': 'flex-end'}),
+        ],
+        style={'display': 'flex', 'align-items': 'flex-start', 'margin-bottom': '20px', 'color': 'black'}
+    ), html.Div(id='free-room-output', style={'margin-left': '60px', 'margin-right': '60px', 'margin-bottom': '30px'})])
+
+# Columns with few distinct values, stored as categoricals
+categorical_columns = ['Subject', 'Catalog', 'Course ID', 'Course Descr', 'Component', 'Building', 'Building Descr', 'Room', 'Facil ID', 'Tech Team', 'Class_Pat']
+
+# Function to convert meeting times (time objects or 'HH:MM:SS' strings) into time since midnight
+def to_time_of_day(values):
+    values = values.map(lambda t: t.strftime('%H:%M:%S') if hasattr(t, 'strftime') else t)
+    return pd.to_timedelta(values, errors='coerce')
+
+# Function to convert the uploaded timetable into its compact in-memory representation:
+# repeated text as categoricals, meeting times as timedelta64 and the weekday Y/N flags as one bitmask
+def type_timetable(df):
+    # Convert tech team abbreviations
+    if 'Tech Team' in df.columns:
+        df['Tech Team'] = df['Tech Team'].map(tech_team_mapping).fillna(df['Tech Team'])
+
+    df['Start Date'] = pd.to_datetime(df['Start Date'], errors='coerce')
+    df['End Date'] = pd.to_datetime(df['End Date'], errors='coerce')
+
+    # Specify columns to preserve as strings:
+    columns_to_preserve_as_strings = ['Class_Pat', 'Course ID', 'Catalog', 'Class Nbr', 'Building', 'Room', 'Facil ID']  # Add column names as needed
+    df[columns_to_preserve_as_strings] = df[columns_to_preserve_as_strings].astype(str)
+
+    for column in ['Meeting Start', 'Meeting End']:
+        df[column] = to_time_of_day(df[column])
+
+    # Bit i of 'Meeting Days' is set when the class meets on weekday i (Monday is 0)
+    if all(day in df.columns for day in weekday_mapping):
+        meeting_days = np.zeros(len(df), dtype='uint8')
+        for day, index in weekday_mapping.items():
+            meeting_days |= np.where(df[day] == 'Y', 1 << index, 0).astype('uint8')
+        df = df.drop(columns=list(weekday_mapping))
+        df['Meeting Days'] = meeting_days
+
+    # Missing text values (e.g. Tech Team, Component) are shown as "None"
+    text_columns = df.select_dtypes(include='object').columns
+    df[text_columns] = df[text_columns].where(df[text_columns].notna(), None)
+
+    for column in categorical_columns:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+
+    df = derive_columns(df)
+
+    # Row positions identify the sections in the occurrence table and filter index
+    return df.reset_index(drop=True)
+
+# Function to build a text column from other columns. The text is formatted once per distinct
+# combination of their values and stored as a categorical.
+def derived_category(df, columns, build):
+    grouped = df.groupby(columns, observed=True, sort=False, dropna=False)
+    labels = build(grouped.head(1)).to_numpy(dtype=object).astype(str)
+    categories, label_codes = np.unique(labels, return_inverse=True)
+    return pd.Series(pd.Categorical.from_codes(label_codes[grouped.ngroup().to_numpy()], categories=categories), index=df.index)
+
+# Function to name the room of each row: building and room, or only the building when there is no room
+def location_labels(df):
+    building_descr = df['Building Descr'].astype(str)
+    room = df['Room'].astype(str)
+    return building_descr.where(room.str.strip() == '', building_descr + ' ' + room)
+
+# Display columns derived once at ingest. The view builders read them from the shared frame
+# and never rebuild or overwrite them.
+def derive_columns(df):
+    if 'Building Descr' in df.columns and 'Room' in df.columns:
+        df['Location'] = derived_category(df, ['Building Descr', 'Room'], location_labels)
+    if 'Subject' in df.columns and 'Catalog' in df.columns:
+        df['Subject / Catalogue'] = derived_category(df, ['Subject', 'Catalog'], lambda rows: rows['Subject'].astype(str) + ' ' + rows['Catalog'].astype(str))
+    # HTML fragments of the timeline labels: the class ("Component, Class_Pat") and the meeting time
+    if 'Component' in df.columns and 'Class_Pat' in df.columns:
+        df['Class Label'] = derived_category(df, ['Component', 'Class_Pat'], lambda rows: display_text(rows['Component']) + ', ' + display_text(rows['Class_Pat']))
+    df['Time Label'] = derived_category(df, ['Meeting Start', 'Meeting End'], lambda rows: '  <b>Time</b>: ' + rows['Meeting Start'].map(format_time_of_day) + ' - ' + rows['Meeting End'].map(format_time_of_day))
+    return df
+
+# Function to format a meeting time (time since midnight) as 'HH:MM'
+def format_time_of_day(time_of_day):
+    if pd.isna(time_of_day):
+        return 'None'
+    minutes = int(time_of_day.total_seconds() // 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+# Function to convert a text column for display, missing values are shown as "None"
+def display_text(series):
+    return series.astype(object).where(series.notna(), 'None').astype(str)
+
+# Function to decode the base64 contents of the upload component into bytes
+def decode_contents(contents):
+    content_type, content_string = contents.split(',', 1)
+    return base64.b64decode(content_string)
+
+# Function to read the decoded bytes of an uploaded file into a DataFrame
+def read_upload(decoded, filename):
+    if 'csv' in filename:
+        return pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+    elif 'xlsx' in filename or 'xls' in filename:  # Handle Excel file formats
+        return pd.read_excel(io.BytesIO(decoded), skiprows=1)  # Adjust skiprows as necessary
+    raise ValueError(f"Unsupported file type: {filename}")
+
 # Function to parse the contents of the uploaded file.
 def parse_contents(contents, filename):
    
     if contents is not None:
-        content_type, content_string = contents.split(',', 1)
-        decoded = base64.b64decode(content_string)
-        
         # # Check the file type and read the data into a DataFrame
         try:
-            if 'csv' in filename:
-                df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-            elif 'xlsx' in filename or 'xls' in filename:  
-                df = pd.read_excel(io.BytesIO(decoded), skiprows=1)  
+            df = read_upload(decode_contents(contents), filename)
             if 'Building Descr' in df.columns and 'Room' in df.columns:
-                df['Location'] = df.apply(lambda row: f"{row['Building Descr']} {row['Room']}" if str(row['Room']).strip() else row['Building Descr'], axis=1)
+                df['Location'] = derived_category(df, ['Building Descr', 'Room'], location_labels)
             else:
                 print("Required columns for creating 'Location' are missing")
             
@@ -380,24 +1488,38 @@ def parse_contents(contents, filename):
             'No file uploaded.'
         ])
 
-@app.callback(
+app.clientside_callback(
+    """
+    function(n_clicks) {
+        if (n_clicks > 0) {
+            return [null, null, null, null, null, null, null, null];
+        }
+        throw dash_clientside.PreventUpdate;
+    }
+    """,
     [
         Output('term-dropdown', 'value'),
         Output('course-dropdown', 'value'),
         Output('date-range-picker', 'start_date'),
         Output('date-range-picker', 'end_date'),
         Output('output-div', 'children', allow_duplicate=True),
+        Output('calendar-view', 'children', allow_duplicate=True),
+        Output('course-view-request', 'data', allow_duplicate=True),
+        Output('course-selection', 'data', allow_duplicate=True),
     ],
     [Input('reset-button', 'n_clicks')],
     prevent_initial_call='initial_duplicate'
 )
-# Function to reset
-def reset(n_clicks):
-    if n_clicks > 0:
-        return None, None, None, None, None
-    return dash.no_update
 
-@app.callback(
+app.clientside_callback(
+    """
+    function(n_clicks) {
+        if (n_clicks > 0) {
+            return [null, null, null, null, null, null, null, null, null, null, null, null, null, null, null, null];
+        }
+        throw dash_clientside.PreventUpdate;
+    }
+    """,
     [
         Output('location-term-dropdown', 'value'),
         Output('tech-team-dropdown', 'value'),
@@ -406,15 +1528,19 @@ def reset(n_clicks):
         Output('location-date-range-picker', 'start_date'),
         Output('location-date-range-picker', 'end_date'),
         Output('location-output-div', 'children', allow_duplicate=True),
+        Output('calendar-view', 'children', allow_duplicate=True),
+        Output('location-view-request', 'data', allow_duplicate=True),
+        Output('location-selection', 'data', allow_duplicate=True),
+        Output('free-room-date', 'date'),
+        Output('free-room-weekday', 'value'),
+        Output('free-room-start', 'value'),
+        Output('free-room-end', 'value'),
+        Output('free-room-capacity', 'value'),
+        Output('free-room-output', 'children', allow_duplicate=True),
     ],
     [Input('reset-button', 'n_clicks')],
     prevent_initial_call='initial_duplicate'
 )
-# Function to reset
-def reset_location(n_clicks):
-    if n_clicks > 0:
-        return None, None, None, None, None, None, None
-    return dash.no_update
 
 # Callback function to clear the output when switching pages
 @app.callback(
@@ -426,6 +1552,7 @@ def reset_location(n_clicks):
     [Input('url', 'pathname')],
     prevent_initial_call=True
 )
+@instrumented_callback
 def clear_output(pathname):
     if pathname in ["/", "/page1", "/page2"]:
         return [], [], 'reset'  
@@ -438,35 +1565,33 @@ def clear_output(pathname):
     [State('upload-data', 'filename')]
 )
 # Function to store the uploaded file's data.
+@instrumented_callback
 def store_data(contents, filename):
     # First, make sure contents is not None
     if contents is not None:
         logging.info("Storing uploaded data.")
-        content_type, content_string = contents.split(',', 1)
-        decoded = base64.b64decode(content_string)
         try:
-            if 'csv' in filename:
-                df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-            elif 'xlsx' in filename or 'xls' in filename:  # Handle Excel file formats
-                df = pd.read_excel(io.BytesIO(decoded), skiprows=1)  # Adjust skiprows as necessary
-
+            decoded = decode_contents(contents)
+            # The upload ID is the hash of the file, re-uploads of the same file skip parsing
+            upload_id = upload_key(decoded, filename)
+            if get_dataset(upload_id) is not None:
+                logging.info(f"Dataset {upload_id} already parsed.")
+                return upload_id
+
+            df = read_upload(decoded, filename)
             logging.info("File loaded successfully.")
 
-            # Convert tech team abbreviations
-            if 'Tech Team' in df.columns:
-                df['Tech Team'] = df['Tech Team'].map(tech_team_mapping).fillna(df['Tech Team'])
-
-            df['Start Date'] = pd.to_datetime(df['Start Date'], errors='coerce')
-            df['End Date'] = pd.to_datetime(df['End Date'], errors='coerce')
-
-            logging.info(f"Start Date and End Date converted. Number of records: {len(df)}")
-
-            # Before converting to JSON:
-            # Specify columns to preserve as strings:
-            columns_to_preserve_as_strings = ['Class_Pat', 'Course ID', 'Catalog', 'Class Nbr', 'Building', 'Room', 'Facil ID']  # Add column names as needed
-            df[columns_to_preserve_as_strings] = df[columns_to_preserve_as_strings].astype(str)
-            return df.to_json(date_format='iso', orient='split')
-            # return df.to_dict('records') 
+            df = type_timetable(df)
+            logging.info(f"Timetable typed. Number of records: {len(df)}, memory: {df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+
+            # Expand the class occurrences once and keep the dataset on the server,
+            # only its upload ID is sent to the browser
+            dataset = Dataset(df)
+            logging.info(f"Class occurrences generated. Number of occurrences: {len(dataset.occurrences)}")
+            register_dataset(dataset, upload_id)
+            save_cached_dataset(upload_id, dataset)
+            logging.info(f"Dataset registered with upload ID {upload_id}.")
+            return upload_id
         except Exception as e:
             print(e)
     raise PreventUpdate
@@ -476,6 +1601,7 @@ def store_data(contents, filename):
     [Input('stored-data', 'children')],
     [State('url', 'pathname')]
 )
+@instrumented_callback
 def set_course_term_options(stored_data, pathname):
     if pathname == '/page2':
         return dash.no_update
@@ -486,64 +1612,128 @@ def set_course_term_options(stored_data, pathname):
     [Input('stored-data', 'children')],
     [State('url', 'pathname')]
 )
+@instrumented_callback
 def set_location_term_options(stored_data, pathname):
     if pathname != '/page2':
         return dash.no_update
     return generate_options(stored_data)
 
 def generate_options(stored_data):
-     if stored_data:
-        df = pd.read_json(stored_data, orient='split')
-        unique_terms = df['Term'].unique()
-        
-        # Mapping from term codes to term names.
-        term_mapping = {
-            4410: "Semester 1",
-            4420: "Semester 2",
-            4405: "Summer School",
-            4415: "Winter School",
-            4433: "Trimester 1",
-            4436: "Trimester 2",
-            4439: "Trimester 3",
-            4448: "Term 4"
-        }
-    
-        options = [
-            {'label': term_mapping.get(term, f'Unknown Term {term}'), 'value': term}
-            for term in unique_terms
-        ]
-        return options
+     dataset = get_dataset(stored_data)
+     if dataset is not None:
+        return dataset.metadata['term_options']
      else:
          return []
 
+@app.callback(
+    Output('publish-feeds-status', 'children'),
+    [Input('publish-feeds-confirm', 'submit_n_clicks')],
+    [State('stored-data', 'children')],
+    prevent_initial_call=True
+)
+# Function to publish the uploaded timetable to the calendar feeds, once the publication is confirmed
+@instrumented_callback
+def publish_calendar_feeds(submit_n_clicks, stored_data):
+    if not submit_n_clicks:
+        raise PreventUpdate
+    if get_dataset(stored_data) is None:
+        return "Upload a timetable first."
+    if published_feed()[0] == stored_data:
+        return "This timetable is already published."
+    if not publish_feed(stored_data):
+        return "The calendar feeds could not be published."
+    logging.info(f"Dataset {stored_data} published to the calendar feeds.")
+    return "Published to the calendar feeds."
+
 # Callback for options of Tech Team 
 @app.callback(
     Output('tech-team-dropdown', 'options'),
     [Input('stored-data', 'children')]
 )
+@instrumented_callback
 def set_tech_team_options(stored_data):
-    if stored_data:
-        df = pd.read_json(stored_data, orient='split')
-        unique_tech_teams = df['Tech Team'].dropna().unique()
+    dataset = get_dataset(stored_data)
+    if dataset is not None:
+        unique_tech_teams = dataset.metadata['tech_teams']
         options = [{'label': 'None', 'value': ''}] + \
                   [{'label': tech_team, 'value': tech_team} for tech_team in unique_tech_teams]
         return options
     else:
         return []
 
+@app.callback(
+    Output('free-room-output', 'children'),
+    [Input('free-room-button', 'n_clicks')],
+    [
+        State('stored-data', 'children'),
+        State('free-room-date', 'date'),
+        State('free-room-weekday', 'value'),
+        State('free-room-start', 'value'),
+        State('free-room-end', 'value'),
+        State('free-room-capacity', 'value'),
+        State('tech-team-dropdown', 'value'),
+        State('location-term-dropdown', 'value'),
+        State('location-date-range-picker', 'start_date'),
+        State('location-date-range-picker', 'end_date'),
+    ],
+    prevent_initial_call=True
+)
+# Function to list the rooms without a class in the time window on a date, or on every date of a weekday
+# in the selected date range (or the selected terms), answered from the room index of the dataset
+@instrumented_callback
+def find_free_rooms(n_clicks, stored_data, selected_date, selected_weekday, start_time, end_time, min_capacity, selected_tech_teams, selected_terms, start_date, end_date):
+    dataset = get_dataset(stored_data)
+    if not n_clicks or dataset is None:
+        raise PreventUpdate
+
+    message_style = {'fontSize': '20px', 'color': 'white'}
+    if not start_time or not end_time or start_time >= end_time:
+        return html.Div("Please select a start and an end time.", style=message_style)
+
+    if selected_date:
+        dates = pd.DatetimeIndex([pd.to_datetime(selected_date).normalize()])
+        when = 'on ' + dates[0].strftime('%A %d %B %Y')
+    elif selected_weekday is not None:
+        if start_date and end_date:
+            first_date, last_date = pd.to_datetime(start_date), pd.to_datetime(end_date)
+        else:
+            _, first_date, last_date = term_summary(dataset.metadata, selected_terms or [])
+        if first_date is None:
+            return html.Div("Please select a term or a date range for the weekday.", style=message_style)
+        dates = pd.date_range(first_date.normalize(), last_date.normalize())
+        dates = dates[dates.weekday == selected_weekday]
+        when = f"every {calendar.day_name[selected_weekday]} from {first_date:%d %B %Y} to {last_date:%d %B %Y} ({len(dates)} dates)"
+    else:
+        return html.Div("Please select a date or a weekday.", style=message_style)
+
+    start_offset = pd.to_timedelta(start_time + ':00')
+    end_offset = pd.to_timedelta(end_time + ':00')
+    rooms = dataset.room_index.free_rooms([(day + start_offset, day + end_offset) for day in dates], min_capacity, selected_tech_teams)
+
+    return html.Div([
+        html.H4(f"{len(rooms)} free rooms {when}, {start_time}-{end_time}", style={'textAlign': 'left', 'color': 'white'}),
+        dash_table.DataTable(
+            data=rooms.to_dict('records'),
+            columns=[{'name': column, 'id': column} for column in rooms.columns],
+            style_table={'width': '100%', 'minWidth': '100%', 'padding': '10px', 'overflowX': 'auto', 'color': '#262B3D', 'fontSize': 14},
+            sort_action='native',
+            filter_action='native',
+            page_action='native',
+            page_size=table_page_size,
+        ),
+    ])
+
 # Function to update the location dropdown based on the selected day and stored data
 def update_location_dropdown(selected_day, stored_data):
-    if not selected_day or not stored_data:
+    dataset = get_dataset(stored_data)
+    if not selected_day or dataset is None:
         
         return {'display': 'none'}, [], None
 
-    df = pd.read_json(stored_data, orient='split')
+    df = dataset.df
     selected_date = pd.to_datetime(selected_day).date()
     df_filtered_day = df[df['Start Date'].dt.date == selected_date]
 
-    # Concatenate building description and room number 
-    df_filtered_day['Location'] = df_filtered_day['Building Descr'] + ' ' + df_filtered_day['Room']
-    
     # locations to populate the dropdown options
     unique_locations = df_filtered_day['Location'].unique()
     location_options = [{'label': location, 'value': location} for location in unique_locations]
@@ -561,169 +1751,246 @@ def check_dates(dates, start_date, end_date):
             return True
     return False
 
+# Callback to turn the course page selections into a selection and a view request.
+# Only the newest complete selection is sent to the server: a half-picked date range, a selection
+# without a chosen view or a request equal to the one already shown is dropped here, so every user
+# action costs at most one render. The upload ID and the click count are part of the request,
+# so a new upload or a click on the shown view renders again.
+app.clientside_callback(
+    """
+    function(selected_terms, selected_course, start_date, end_date, last_clicked_button_data, upload_id, previous_selection, previous_request) {
+        if (!selected_terms || !selected_terms.length || Boolean(start_date) !== Boolean(end_date)) {
+            throw dash_clientside.PreventUpdate;
+        }
+        const selection = {
+            'terms': selected_terms,
+            'courses': selected_course || null,
+            'start_date': start_date || null,
+            'end_date': end_date || null
+        };
+        // The view request adds the view, its click count and the upload; no render is requested before a view is chosen
+        const button = last_clicked_button_data ? last_clicked_button_data.button : null;
+        const request = button ? Object.assign({}, selection, {
+            'button': button,
+            'clicks': last_clicked_button_data.clicks,
+            'upload_id': upload_id || null
+        }) : null;
+        const selection_changed = JSON.stringify(selection) !== JSON.stringify(previous_selection);
+        const request_changed = request !== null && JSON.stringify(request) !== JSON.stringify(previous_request);
+        if (!selection_changed && !request_changed) {
+            throw dash_clientside.PreventUpdate;
+        }
+        return [
+            selection_changed ? selection : dash_clientside.no_update,
+            request_changed ? request : dash_clientside.no_update
+        ];
+    }
+    """,
+    [Output('course-selection', 'data'), Output('course-view-request', 'data')],
+    [
+        Input('term-dropdown', 'value'),
+        Input('course-dropdown', 'value'),
+        Input('date-range-picker', 'start_date'),
+        Input('date-range-picker', 'end_date'),
+        Input('last-clicked-button', 'data'),
+        Input('stored-data', 'children'),
+    ],
+    [State('course-selection', 'data'), State('course-view-request', 'data')]
+)
+
+# Callback to point the export links of a page at the export of its current selection
+for export_page in ['course', 'location']:
+    app.clientside_callback(
+        """
+        function(selection, upload_id) {
+            if (!selection || !upload_id) {
+                return [{'display': 'none'}, null, null, null];
+            }
+            const query = '?upload_id=' + encodeURIComponent(upload_id) + '&page=PAGE&selection=' + encodeURIComponent(JSON.stringify(selection));
+            return [
+                {'display': 'flex', 'align-items': 'center', 'margin-left': '60px', 'margin-bottom': '20px'},
+                '/export/csv' + query, '/export/xlsx' + query, '/export/ics' + query
+            ];
+        }
+        """.replace('PAGE', export_page),
+        [
+            Output(f'{export_page}-export-links', 'style'),
+            Output(f'{export_page}-export-csv', 'href'),
+            Output(f'{export_page}-export-xlsx', 'href'),
+            Output(f'{export_page}-export-ics', 'href'),
+        ],
+        [Input(f'{export_page}-selection', 'data'), Input('stored-data', 'children')],
+    )
+
 @app.callback(
     [
         Output('course-dropdown', 'options'),
-        Output('output-div', 'children'),
         Output('date-range-picker', 'min_date_allowed'),
         Output('date-range-picker', 'max_date_allowed'),
     ],
+    [Input('term-dropdown', 'value'), Input('stored-data', 'children')]
+)
+# Function to list the courses and date bounds of the selected terms, from the metadata computed at upload.
+# It is a plain callback, the course list appears without waiting for a render process.
+@instrumented_callback
+def set_course_options(selected_terms, stored_data):
+    dataset = get_dataset(stored_data)
+    if dataset is None or not selected_terms:
+        return [], None, None
+    term_courses, min_date, max_date = term_summary(dataset.metadata, selected_terms)
+    courses = [{'label': course, 'value': course} for course in term_courses]
+    if min_date is None:
+        return courses, None, None
+    return courses, min_date.strftime('%Y-%m-%d'), max_date.strftime('%Y-%m-%d')
+
+@app.callback(
     [
-        Input('term-dropdown', 'value'),
-        Input('course-dropdown', 'value'),
-        Input('date-range-picker', 'start_date'),
-        Input('date-range-picker', 'end_date'),
-        Input('show-pie-chart', 'n_clicks'),
-        Input('show-table', 'n_clicks'),
-        Input('show-timeline', 'n_clicks'), 
-        Input('last-clicked-button', 'data'),
+        Output('output-div', 'children'),
+        Output('calendar-view', 'children'),
+        Output('current-month', 'data'),
     ],
-    [State('stored-data', 'children')]
+    [Input('course-view-request', 'data')],
+    [State('stored-data', 'children')],
+    prevent_initial_call=True,
+    background=True,
+    running=[(Output('course-progress', 'style'), progress_bar_visible, progress_bar_hidden)],
+    progress=[Output('course-progress', 'value'), Output('course-progress', 'max')],
+    progress_default=[0, 1],
+    cancel=[Input('url', 'pathname'), Input('reset-button', 'n_clicks'), Input('upload-data', 'contents')],
 )
-# update various components based on dropdown selections
-def update_course(selected_terms, selected_course, start_date, end_date, pie_n_clicks, table_n_clicks,timeline_n_clicks, last_clicked_button_data, stored_data):
-    if not stored_data or not selected_terms:
+# render the selected view of the course page, the calendar included
+@instrumented_callback
+def update_course(set_progress, view_request, stored_data):
+    dataset = get_dataset(stored_data)
+    if dataset is None or not view_request or not view_request['button']:
         raise PreventUpdate
 
-    df = pd.read_json(stored_data, orient='split', dtype={'Class_Pat': object})
-    # df = pd.read_json(stored_data, orient='split')
+    selected_terms = view_request['terms']
+    selected_course = view_request['courses']
+    start_date = view_request['start_date']
+    end_date = view_request['end_date']
+    last_clicked = view_request['button']
 
-
-    df = df[df['Term'].isin(selected_terms)]
-    
-    if df.empty or 'Start Date' not in df.columns or 'End Date' not in df.columns:
-        return [], [html.Div("Start Date and/or End Date column not found.")], None, None
+    # Date bounds of the selected terms come from the metadata computed at upload
+    df = dataset.df
+    _, min_date, _ = term_summary(dataset.metadata, selected_terms)
     
-    df['Start Date'] = pd.to_datetime(df['Start Date'], errors='coerce')
-    df['End Date'] = pd.to_datetime(df['End Date'], errors='coerce')
-
-    non_convertible_start_date = df.loc[df['Start Date'].isna(), 'Start Date']
-    non_convertible_end_date = df.loc[df['End Date'].isna(), 'End Date']
+    if min_date is None or 'Start Date' not in df.columns or 'End Date' not in df.columns:
+        return [html.Div("Start Date and/or End Date column not found.")], None, dash.no_update
 
     # debug lines
-    if not non_convertible_start_date.empty or not non_convertible_end_date.empty:
+    invalid_date_terms = [term for term in selected_terms if term in dataset.metadata['invalid_date_terms']]
+    if invalid_date_terms:
         error_message = "Start Date and/or End Date column could not be converted to datetime."
-        print("Non-convertible Start Dates:")
-        print(non_convertible_start_date)
-        print("Non-convertible End Dates:")
-        print(non_convertible_end_date)
-        print("-------------------------")
-        print(df['End Date'])
-        return [], [html.Div(error_message)], None, None   
-    
-    min_date_allowed = df['Start Date'].min().strftime('%Y-%m-%d')
-    max_date_allowed = df['End Date'].max().strftime('%Y-%m-%d')
-
-    for day in weekday_mapping:
-        if day not in df.columns:
-            return [], [html.Div(f"{day} column not found.")]
-
-    # Generate options for courses
-    courses = [{'label': course, 'value': course} for course in df['Course Descr'].unique()]
-    children = []
+        print(f"Non-convertible Start/End Dates in terms: {invalid_date_terms}")
+        return [html.Div(error_message)], None, dash.no_update
     
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        button_id = 'No clicks yet'
-    else:
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-
-    children = html.Div()  
+    if 'Meeting Days' not in df.columns:
+        return [html.Div("Weekday columns not found.")], None, dash.no_update
 
-    if selected_course:
-        
-        df_filtered = df[df['Course Descr'].isin(selected_course)]
-
-        if df_filtered.empty:
-            return courses, [html.Div("No courses found with the selected terms and courses.", style={'fontSize': '25px'})], min_date_allowed, max_date_allowed
-
-        df_filtered['Course Dates'] = df_filtered.apply(lambda row: generate_course_dates(row, weekday_mapping), axis=1)
-        
-        # debug line
-        # print(df_filtered[['Course Descr', 'Course Dates']])
+    # Without a selected course, the calendar shows every course of the selected terms
+    if not selected_course and last_clicked != 'show-calendar':
+        return [], None, dash.no_update
 
-        if 'Course Dates' not in df_filtered.columns or not df_filtered['Course Dates'].apply(lambda x: isinstance(x, list)).any():
-            return courses, [html.Div("Course Dates column could not be created.")], min_date_allowed, max_date_allowed
+    # Check the date range before any data is filtered or expanded
+    start_date = pd.to_datetime(start_date).replace(hour=0, minute=0, second=0) if start_date else None
+    end_date = pd.to_datetime(end_date).replace(hour=23, minute=59, second=59) if end_date else None
 
-        # Filter the courses based on the selected date range
-        if start_date and end_date:
-
-            start_date = pd.to_datetime(start_date).replace(hour=0, minute=0, second=0)
-            end_date = pd.to_datetime(end_date).replace(hour=23, minute=59, second=59)
-            
-            mask = df_filtered['Course Dates'].apply(
-                lambda dates: any(start_date <= d[0] <= end_date for d in dates) if isinstance(dates, list) else False
-            )
-    
-            # debug line
-            # print("Mask for selected date range:", mask)
+    if not start_date or not end_date or start_date > end_date:
+        return html.Div("Please select a valid date range.", style={'fontSize': '25px'}), None, dash.no_update
+
+    # Room utilisation, conflicts and tech team workload are views of the location page
+    if last_clicked in ('show-utilisation', 'show-conflicts', 'show-workload'):
+        return [html.Div("This view is available on the location page.", style={'fontSize': '25px'})], None, dash.no_update
+
+    course_filters = {'Term': selected_terms, 'Course Descr': selected_course}
+
+    # The calendar filters and renders one month at a time by itself
+    if last_clicked == 'show-calendar':
+        spec = {
+            'upload_id': stored_data,
+            'filters': course_filters,
+            'start_date': pd.to_datetime(view_request['start_date']).isoformat(),
+            'end_date': pd.to_datetime(view_request['end_date']).isoformat(),
+            'restrict_sections': False,
+        }
+        set_progress((1, 2))
+        calendar_view, current_month = create_calendar_view(spec)
+        return [], calendar_view, current_month
 
-            if not mask.any():
+    # Progress steps: filter, expand, then one per selected course
+    total_steps = 2 + len(selected_course)
 
-                error_message = "No courses found in the selected date range."
-                print(error_message)
-                return courses, [html.Div(error_message, style={'fontSize': '25px'})], min_date_allowed, max_date_allowed
-            
-            df_filtered = df_filtered[mask]
+    # Filter the courses based on the selected date range
+    df_filtered = dataset.select(course_filters, start_date, end_date, view_columns.get(last_clicked))
+    occurrences = dataset.occurrences_between(start_date, end_date)
 
-        if 'Course Dates' in df_filtered.columns:
+    if df_filtered.empty:
+        error_message = "No courses found in the selected date range."
+        print(error_message)
+        return [html.Div(error_message, style={'fontSize': '25px'})], None, dash.no_update
+    set_progress((1, total_steps))
 
-            df_filtered = df_filtered.explode('Course Dates')
-            df_filtered['Location'] = df_filtered['Building Descr'] + ' ' + df_filtered['Room']
+    # One row per class occurrence, read from the occurrences generated at upload
+    df_filtered = explode_occurrences(df_filtered, occurrences)
+    set_progress((2, total_steps))
 
-            last_clicked = last_clicked_button_data['button']
+    if df_filtered.empty:
+        return [html.Div("No valid dates for the selected courses.")], None, dash.no_update
 
-            if last_clicked != 'No clicks yet':
-                start_date = pd.to_datetime(start_date) if start_date else None
-                end_date = pd.to_datetime(end_date) if end_date else None
+    #  Create visualizations based on the filtered data and the button clicked.
+    children = []
+    if last_clicked == 'show-pie-chart':
+        children = render_per_course(set_progress, df_filtered, selected_course, lambda df_course, course: create_children_for_locations(df_course, start_date, end_date))
+    elif last_clicked == 'show-table':
+        table_spec = {'upload_id': stored_data, 'filters': course_filters}
+        children = render_per_course(set_progress, df_filtered, selected_course, lambda df_course, course: create_table_for_selected_course(df_course, start_date, end_date, course, table_spec))
+    elif last_clicked == 'show-timeline':
+        children = render_per_course(set_progress, df_filtered, selected_course, lambda df_course, course: create_timeline_for_selected_course(df_course, start_date, end_date, course))
+    elif last_clicked == 'show-capacity':
+        children = [create_capacity_overview(df_filtered, 'course')]
+    return children, None, dash.no_update
+
+# Columns of the sections each view reads. Only these are copied out of the shared dataset for a request;
+# the occurrence times are added by explode_occurrences.
+view_columns = {
+    'show-pie-chart': ['Course Descr', 'Subject / Catalogue', 'Component', 'Location', 'Room Capacity', 'Enrl Capacity', 'Meeting Start', 'Meeting End', 'Tech Team'],
+    'show-table': ['Course Descr', 'Subject / Catalogue', 'Location', 'Room Capacity', 'Enrl Capacity', 'Tech Team'],
+    'show-timeline': ['Course Descr', 'Location', 'Class Label', 'Time Label', 'Meeting Start', 'Meeting End', 'Tech Team', 'Pattern Nbr'],
+    'show-capacity': ['Course Descr', 'Subject', 'Catalog', 'Component', 'Location', 'Room Capacity', 'Enrl Capacity', 'Meeting Start', 'Meeting End'],
+    'show-utilisation': ['Building Descr', 'Location'],
+}
 
-                if not start_date or not end_date or start_date > end_date:
-                    return courses, html.Div("Please select a valid date range.", style={'fontSize': '25px'}), None , None
-    
-            #  Create visualizations based on the filtered data and the button clicked.
-            if last_clicked == 'show-pie-chart':
-                children = [create_children_for_locations(df_filtered[df_filtered['Course Descr'] == course], start_date, end_date) for course in selected_course]
-            elif last_clicked == 'show-table':
-                children = [create_table_for_selected_course(df_filtered[df_filtered['Course Descr'] == course], start_date, end_date, course) for course in selected_course]
-            elif last_clicked == 'show-timeline':
-                children = [create_timeline_for_selected_course(df_filtered[df_filtered['Course Descr'] == course], start_date, end_date,course) for course in selected_course]
-        else:
-            return courses, [html.Div("No valid dates for the selected courses.")], min_date_allowed, max_date_allowed
-        # debug lines
-        # print("Generated 'Course Dates' after date filtering:\n", df_filtered['Course Dates'])
-        return courses, children, min_date_allowed, max_date_allowed
-    else:
-        return courses, [], min_date_allowed, max_date_allowed
+# Function to build one view per selected course, reporting progress after each course
+def render_per_course(set_progress, df_filtered, selected_course, build):
+    children = []
+    for done, course in enumerate(selected_course, start=1):
+        children.append(build(df_filtered[df_filtered['Course Descr'] == course], course))
+        set_progress((2 + done, 2 + len(selected_course)))
+    return children
 
 # function to organize the pie charts
+@timed('render')
 def create_children_for_locations(df_filtered, start_date, end_date):
 
-    # Speed testing
-    start_time_speed = time.time()
 
-     # Concatenate building description and room number 
-    df_filtered['Location'] = df_filtered['Building Descr'] + ' ' + df_filtered['Room']
-
-    # Fill empty value for Component column 
+    # Sections without a component are grouped under 'Unknown', without writing to the selection
     if 'Component' not in df_filtered.columns:
-        df_filtered['Component'] = 'Unknown'  
+        component = pd.Series('Unknown', index=df_filtered.index, name='Component')
     else:
-        df_filtered['Component'] = df_filtered['Component'].fillna('Unknown')
-
-    df_filtered['Subject / Catalogue'] = df_filtered['Subject'].astype(str) + ' ' + df_filtered['Catalog'].astype(str)    
+        component = df_filtered['Component'].astype(object).fillna('Unknown')
 
-    grouped_df = df_filtered.groupby(['Component', 'Location', 'Room Capacity', 'Enrl Capacity', 'Meeting Start', 'Meeting End', 'Subject / Catalogue'])
+    grouped_df = df_filtered.groupby([component, 'Location', 'Room Capacity', 'Enrl Capacity', 'Meeting Start', 'Meeting End', 'Subject / Catalogue'], observed=True)
 
     start_date = pd.to_datetime(start_date).date()  
     end_date = pd.to_datetime(end_date).date()
 
-    exploded_df = df_filtered.explode('Course Dates')
-    exploded_df['Course Dates'] = pd.to_datetime(exploded_df['Course Dates']).dt.date
+    class_dates = df_filtered['Start Datetime'].dt.date
 
-    filtered_dates_df = exploded_df[(exploded_df['Course Dates'] >= start_date) & 
-                                    (exploded_df['Course Dates'] <= end_date)]
+    filtered_dates = class_dates[(class_dates >= start_date) & 
+                                 (class_dates <= end_date)]
 
-    all_dates = filtered_dates_df['Course Dates'].unique()
+    all_dates = filtered_dates.unique()
     sorted_dates = sorted(all_dates)
     dates_str = ', '.join([date.strftime('%Y-%m-%d') for date in sorted_dates])
 
@@ -738,14 +2005,14 @@ def create_children_for_locations(df_filtered, start_date, end_date):
         capacity_str = f"Enrol Capacity: {enrl_capacity}, Room Capacity: {room_capacity}"
 
         tech_team = group['Tech Team'].iloc[0] if 'Tech Team' in group.columns else None
-        tech_team_info = f"Tech Team: {tech_team}" if tech_team else "Tech Team: None"
+        tech_team_info = f"Tech Team: {tech_team}" if pd.notna(tech_team) and tech_team else "Tech Team: None"
         course_descr_str = group['Course Descr'].iloc[0]
         subject_catalogue = group['Subject / Catalogue'].iloc[0]
 
         chart_div = html.Div([
             html.H2(course_descr_str),
             html.H4(subject_catalogue),
-            html.H4(f"Location: {location}, Time: {start_time[:5]} - {end_time[:5]}"),
+            html.H4(f"Location: {location}, Time: {format_time_of_day(start_time)} - {format_time_of_day(end_time)}"),
             html.H4(f"Dates: {dates_str}"),
             html.H4(tech_team_info),
             html.H4(capacity_str),
@@ -756,20 +2023,171 @@ def create_children_for_locations(df_filtered, start_date, end_date):
 
     charts_container.children = children
 
-    # Speed testing 
-    end_time_speed = time.time()
-    processing_time = end_time_speed - start_time_speed
-    print(f"Pie Chart Processing Time: {processing_time:.3f} seconds")
 
     return charts_container
 
+# Number of rows in each page of the tables
+table_page_size = 30
+
+# Operators of the DataTable filter query language
+table_filter_operators = [['ge ', '>='], ['le ', '<='], ['lt ', '<'], ['gt ', '>'], ['ne ', '!='], ['eq ', '='], ['contains '], ['datestartswith ']]
+
+# Function to restrict the occurrences to the date range and add the display columns of the tables
+def format_table_rows(df_filtered, start_date=None, end_date=None):
+    if start_date is not None and end_date is not None:
+        df_filtered = df_filtered[(df_filtered['Start Datetime'] <= end_date) & 
+                                  (df_filtered['End Datetime'] >= start_date)]
+
+    # Format the occurrence times for display in the table
+    df_filtered = df_filtered.sort_values(by='Start Datetime', kind='stable')
+    tech_team = display_text(df_filtered['Tech Team']) if 'Tech Team' in df_filtered.columns else 'None'
+    return df_filtered.assign(**{
+        'Course Dates': df_filtered['Start Datetime'].dt.strftime('%Y-%m-%d %H:%M') + '-' + df_filtered['End Datetime'].dt.strftime('%H:%M'),
+        'Course Descr': df_filtered['Course Descr'].astype(str),
+        'Tech Team': tech_team,
+    })
+
+# Function to rebuild the rows of a table from its query spec (upload ID, filters, course and date range)
+def table_rows(spec):
+    dataset = get_dataset(spec['upload_id'])
+    if dataset is None:
+        return None
+
+    filters = dict(spec['filters'], **{'Course Descr': [spec['course_descr']]})
+    start_date = pd.to_datetime(spec['start_date']) if spec['start_date'] else None
+    end_date = pd.to_datetime(spec['end_date']) if spec['end_date'] else None
+
+    if start_date is not None and end_date is not None:
+        df = dataset.select(filters, start_date, end_date, view_columns['show-table'])
+        occurrences = dataset.occurrences_between(start_date, end_date)
+    else:
+        df = dataset.select(filters, columns=view_columns['show-table'])
+        occurrences = dataset.occurrences
+
+    return format_table_rows(explode_occurrences(df, occurrences), start_date, end_date)
+
+# Function to split one clause of a filter query into column, operator and value
+def split_filter_part(filter_part):
+    for operator_type in table_filter_operators:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                value = value_part
+                if value_part and value_part[0] == value_part[-1] and value_part[0] in ("'", '"', '`'):
+                    value = value_part[1:-1].replace('\\' + value_part[0], value_part[0])
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+# Function to apply the filter query and sort order of a table to its rows
+def apply_table_query(df, filter_query, sort_by):
+    for filter_part in (filter_query or '').split(' && '):
+        column, operator, value = split_filter_part(filter_part)
+        if column not in df.columns:
+            continue
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            values = df[column]
+            # The display columns are unordered categoricals, compare their text
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(str)
+            if isinstance(value, float) and not pd.api.types.is_numeric_dtype(values):
+                value = str(value).removesuffix('.0')
+            df = df.loc[getattr(values, operator)(value)]
+        elif operator == 'contains':
+            df = df.loc[df[column].astype(str).str.contains(str(value), case=False, regex=False)]
+        elif operator == 'datestartswith':
+            df = df.loc[df[column].astype(str).str.startswith(str(value))]
+
+    if sort_by:
+        df = df.sort_values(
+            [column['column_id'] for column in sort_by],
+            ascending=[column['direction'] == 'asc' for column in sort_by],
+            kind='stable'
+        )
+    return df
+
+# Function to get one page of table rows as records
+def table_page(df, column_ids, page_current, page_size):
+    first = page_current * page_size
+    page_count = max(1, -(-len(df) // page_size))
+    return df.iloc[first:first + page_size][column_ids].to_dict('records'), page_count
+
+# Function to create a DataTable that is paged, sorted and filtered on the server.
+# The spec stored next to the table lets the page callback rebuild its rows.
+def create_server_table(group, table_columns, table_spec, course_descr, start_date, end_date):
+    table_style = {'width': '100%', 'minWidth': '100%', 'padding': '10px', 'overflowX': 'auto', 'color': '#262B3D', 'fontSize': 14}
+    column_ids = [column['id'] for column in table_columns]
+    spec = dict(
+        table_spec,
+        course_descr=course_descr,
+        start_date=start_date.isoformat() if pd.notna(start_date) else None,
+        end_date=end_date.isoformat() if pd.notna(end_date) else None,
+        columns=column_ids,
+    )
+    data, page_count = table_page(group, column_ids, 0, table_page_size)
+
+    return html.Div([
+        dcc.Store(id={'type': 'table-spec', 'index': course_descr}, data=spec),
+        dash_table.DataTable(
+            id={'type': 'server-table', 'index': course_descr},
+            data=data,
+            columns=table_columns,
+            style_table=table_style,
+            filter_action="custom",
+            filter_query='',
+            sort_action="custom",
+            sort_mode="multi",
+            sort_by=[],
+            page_action="custom",
+            page_current=0,
+            page_size=table_page_size,
+            page_count=page_count,
+        ),
+    ])
+
+@app.callback(
+    [
+        Output({'type': 'server-table', 'index': MATCH}, 'data'),
+        Output({'type': 'server-table', 'index': MATCH}, 'page_count'),
+    ],
+    [
+        Input({'type': 'server-table', 'index': MATCH}, 'page_current'),
+        Input({'type': 'server-table', 'index': MATCH}, 'page_size'),
+        Input({'type': 'server-table', 'index': MATCH}, 'sort_by'),
+        Input({'type': 'server-table', 'index': MATCH}, 'filter_query'),
+    ],
+    [State({'type': 'table-spec', 'index': MATCH}, 'data')],
+    prevent_initial_call=True
+)
+# Function to send the requested page of a table to the browser
+@instrumented_callback
+def update_table_page(page_current, page_size, sort_by, filter_query, spec):
+    if not spec:
+        raise PreventUpdate
+    df = table_rows(spec)
+    if df is None:
+        raise PreventUpdate
+
+    df = apply_table_query(df, filter_query, sort_by)
+    return table_page(df, spec['columns'], page_current or 0, page_size or table_page_size)
+
 # Function to create a table for selected course
-def create_table_for_selected_course(df_filtered, start_date, end_date, course_name):
+@timed('render')
+def create_table_for_selected_course(df_filtered, start_date, end_date, course_name, table_spec):
 
-    # Speed testing
-    start_time_speed = time.time()
 
-    if df_filtered.empty or 'Course Dates' not in df_filtered.columns:
+    if df_filtered.empty or 'Start Datetime' not in df_filtered.columns:
         
         return html.Div([
             html.H3(course_name, style={'textAlign': 'left'}),  # Course name as header
@@ -780,22 +2198,7 @@ def create_table_for_selected_course(df_filtered, start_date, end_date, course_n
     start_date = pd.to_datetime(start_date)
     end_date = pd.to_datetime(end_date)
 
-    df_filtered = df_filtered[df_filtered['Course Dates'].apply(lambda x: 
-        (x[0] if x[0] is not None else pd.to_datetime('1900-01-01')) <= end_date and 
-        (x[1] if x[1] is not None else pd.to_datetime('2100-01-01')) >= start_date
-    )]
-
-    if 'Course Dates' in df_filtered.columns:
-        df_filtered['Course Dates'] = df_filtered['Course Dates'].apply(lambda x: f"{x[0].strftime('%Y-%m-%d %H:%M')}-{x[1].strftime('%H:%M')}" if isinstance(x, tuple) else x)
-        df_filtered.sort_values(by=['Course Dates'], inplace=True, key=lambda x: pd.to_datetime(x.str.split('-').str[0]))
-    else:
-        return html.Div("The 'Course Dates' column could not be found.")
-
-    df_filtered['Subject / Catalogue'] = df_filtered['Subject'].astype(str) + ' ' + df_filtered['Catalog'].astype(str)
-
-    # Add 'Tech Team' column 
-    if 'Tech Team' not in df_filtered.columns:
-        df_filtered['Tech Team'] = 'None'
+    df_filtered = format_table_rows(df_filtered, start_date, end_date)
 
     table_columns = [
         {"name": "Subject / Catalogue", "id": "Subject / Catalogue"},
@@ -806,47 +2209,48 @@ def create_table_for_selected_course(df_filtered, start_date, end_date, course_n
         {"name": "Tech Team", "id": "Tech Team"},
     ]
 
-    df_filtered.sort_values('Course Descr', inplace=True)
-    
     children = []
     table_container_style = {'margin-bottom': '20px', 'overflowX': 'auto'}
-    table_style = {'width': '100%', 'minWidth': '100%', 'padding': '10px', 'overflowX': 'auto', 'color': '#262B3D', 'fontSize': 14}
 
-    for course_descr, group in df_filtered.groupby('Course Descr'):
+    for course_descr, group in df_filtered.groupby('Course Descr', observed=True):
         # Create a subheader 
         children.append(html.H3(course_descr, style={'textAlign': 'left'}))
 
-        # Create a table for each group
-        table = dash_table.DataTable(
-            data=group.to_dict('records'),
-            columns=table_columns,
-            style_table=table_style,
-            filter_action="none", 
-            sort_action="native",    
-            page_action="native",   
-            page_size=30,
-        )
+        # Create a table for each group, the browser only receives the visible page
+        table = create_server_table(group, table_columns, table_spec, course_descr, start_date, end_date)
         
         children.append(html.Div(table, style=table_container_style))
         children.append(html.Hr(style={'marginTop': '20px', 'marginBottom': '20px'}))
     
-    # Speed testing 
-    end_time_speed = time.time()
-    processing_time = end_time_speed - start_time_speed
-    print(f"Table Processing Time: {processing_time:.3f} seconds")
 
     return html.Div(children, style={'overflowX': 'auto'})
 
+# Origin of the time axis of the timelines
+timeline_origin = pd.Timestamp('1900-01-01')
+
+# Function to keep the occurrences dated between start_date and end_date, with their 'Course Date'.
+# The result is a new frame, so the timelines never write into the selection they were given.
+def select_course_dates(df, start_date, end_date):
+    course_dates = df['Start Datetime'].dt.date
+    in_range = (course_dates >= start_date) & (course_dates <= end_date)
+    return df[in_range].assign(**{
+        'Course Date': course_dates[in_range],
+        'Course Descr': df.loc[in_range, 'Course Descr'].astype(object).fillna('Unknown'),
+    })
+
+# Function to place the meeting times on the 1900-01-01 time axis of the timelines
+def place_on_timeline(df):
+    return df.assign(**{
+        'Meeting Start': timeline_origin + df['Meeting Start'],
+        'Meeting End': timeline_origin + df['Meeting End'],
+    })
+
 # Function to create a timeline for selected course
+@timed('render')
 def create_timeline_for_selected_course(df,start_date, end_date, course):
     
-    # Speed testing
-    start_time_speed = time.time()
 
     # print(course)
-    specific_columns = ['Building', 'Building Descr', 'Room', 'Course Descr', 'Course ID']
-    df[specific_columns] = df[specific_columns].fillna('Unknown')
- 
     charts_container = html.Div(style={'display': 'flex', 'flex-wrap': 'wrap'})
 
     children = []
@@ -854,40 +2258,34 @@ def create_timeline_for_selected_course(df,start_date, end_date, course):
     start_date = pd.to_datetime(start_date).date()  
     end_date = pd.to_datetime(end_date).date()
 
-    # exploded_df = df.explode('Course Dates')
-    df['Course Date'] = df['Course Dates'].apply(lambda x: pd.to_datetime(x[0]))
-
-    df['Course Date'] = pd.to_datetime(df['Course Date']).dt.date
-
-    df = df[(df['Course Date'] >= start_date) & 
-                                    (df['Course Date'] <= end_date)]
+    df = select_course_dates(df, start_date, end_date)
     
     if len(df) != 0:
         df = df.drop_duplicates(subset=['Pattern Nbr', 'Course Date', 'Meeting Start'], keep='first')
-        time_format = "%H:%M:%S"  # Adjust the format if necessary
-        
-        df['Meeting Start'] = pd.to_datetime(df['Meeting Start'].astype(str), format=time_format)
-        df['Meeting End'] = pd.to_datetime(df['Meeting End'].astype(str), format=time_format)
+        df = place_on_timeline(df)
          
-        df['Location'] =   'Building: <b>' + df['Building Descr'] + ' '+df['Room'].astype(str) +  '</b>  Date: <b>' + df['Course Date'].astype(str) + '</b> <br>Class: <b>'+ df['Component'].astype(str) +', ' + df['Class_Pat'].astype(str) + '</b> Tech Team: <b>'+  df['Tech Team'].astype(str)+'</b>' 
-
-        df['Class Time2'] = '<b>' + df['Course Descr'].astype(str)  +'</b>' +  '<br><b>Class</b>: ' + df['Component'].astype(str) +', ' +df['Class_Pat'].astype(str) +'<br><b>Date</b>: ' + df['Course Date'].astype(str)+'  <b>Time</b>: ' + df['Meeting Start'].dt.strftime('%H:%M') + ' - ' + df['Meeting End'].dt.strftime('%H:%M')
-        df['Class Time'] = '  <b>Time</b>: ' + df['Meeting Start'].dt.strftime('%H:%M') + ' - ' + df['Meeting End'].dt.strftime('%H:%M')
+        # Labels are assembled from the class and time labels derived at ingest
+        class_label = df['Class Label'].astype(str)
+        time_label = df['Time Label'].astype(str)
+        df = df.assign(**{
+            'Location Label': 'Building: <b>' + df['Location'].astype(str) +  '</b>  Date: <b>' + df['Course Date'].astype(str) + '</b> <br>Class: <b>'+ class_label + '</b> Tech Team: <b>'+  display_text(df['Tech Team'])+'</b>',
+            'Class Time2': '<b>' + df['Course Descr'].astype(str)  +'</b>' +  '<br><b>Class</b>: ' + class_label +'<br><b>Date</b>: ' + df['Course Date'].astype(str) + time_label,
+        })
 
         df = df.sort_values(by=['Course Date', 'Meeting Start'], ascending=False)                                
 
-        tmp_df = df.drop_duplicates(subset=['Location', 'Course Date'], keep='first')                               
-        if len(tmp_df['Location']) <=2:
+        tmp_df = df.drop_duplicates(subset=['Location Label', 'Course Date'], keep='first')                               
+        if len(tmp_df['Location Label']) <=2:
             chart_height= 260
-        elif len(tmp_df['Location']) <=4:
+        elif len(tmp_df['Location Label']) <=4:
             chart_height= 360
-        elif len(tmp_df['Location']) <=6:
+        elif len(tmp_df['Location Label']) <=6:
             chart_height= 460
         else:
-            chart_height= len(tmp_df['Location']) * 67
+            chart_height= len(tmp_df['Location Label']) * 67
 
         course_title=df['Course Descr'].unique()[0]                               
-        fig = px.timeline(df, x_start='Meeting Start', x_end='Meeting End', y='Location', color = "Class Time2", text='Class Time', height=chart_height ,title=course_title)
+        fig = px.timeline(df, x_start='Meeting Start', x_end='Meeting End', y='Location Label', color = "Class Time2", text='Time Label', height=chart_height ,title=course_title, labels={'Location Label': 'Location', 'Time Label': 'Class Time'})
                                          
         fig.update_layout(showlegend=False, xaxis_title="Time", yaxis_title="Location", hovermode=False)   
 
@@ -903,7 +2301,7 @@ def create_timeline_for_selected_course(df,start_date, end_date, course):
 
         # fig.update_traces(width= 0.6 ,textposition='inside',  insidetextanchor='end',insidetextfont=dict( size=11, color='white'))
         # countLocation = len(tmp_df['Location'].unique())
-        unique_location_date_counts = tmp_df.groupby(['Location', 'Course Date']).size()
+        unique_location_date_counts = tmp_df.groupby(['Location Label', 'Course Date']).size()
         countLocation = unique_location_date_counts.sum()
         if countLocation > 1:
             fig.update_traces(width= 0.6 ,textposition='inside',  insidetextanchor='end',insidetextfont=dict( size=11, color='white'))
@@ -924,18 +2322,10 @@ def create_timeline_for_selected_course(df,start_date, end_date, course):
 
         charts_container.children = children
 
-        # Speed testing 
-        end_time_speed = time.time()
-        processing_time = end_time_speed - start_time_speed
-        print(f"Timeline Processing Time: {processing_time:3f} seconds")
 
         return charts_container
     else:
         
-        # Speed testing 
-        end_time_speed = time.time()
-        processing_time = end_time_speed - start_time_speed
-        print(f"Timeline Processing Time: {processing_time:.3f} seconds")
 
         return html.Div([
             html.H3(course, style={'textAlign': 'left'}),  # Course name as header
@@ -946,20 +2336,17 @@ def create_timeline_for_selected_course(df,start_date, end_date, course):
 def generate_course_dates(row, weekday_mapping):
     start_date = row['Start Date']
     end_date = row['End Date']
-    meeting_start_time_str = row['Meeting Start']
-    meeting_end_time_str = row['Meeting End']
+    meeting_start = row['Meeting Start']
+    meeting_end = row['Meeting End']
     dates = []
     
     for day, index in weekday_mapping.items():
-        if row[day] == 'Y':
+        if (row['Meeting Days'] >> index) & 1:
             current_date = start_date + timedelta(days=(index - start_date.weekday()) % 7)
             while current_date <= end_date:
             
-                start_time = datetime.strptime(meeting_start_time_str, '%H:%M:%S').time()
-                end_time = datetime.strptime(meeting_end_time_str, '%H:%M:%S').time()
-                
-                start_datetime = datetime.combine(current_date, start_time)
-                end_datetime = datetime.combine(current_date, end_time)
+                start_datetime = current_date + meeting_start
+                end_datetime = current_date + meeting_end
                 
                 dates.append((start_datetime, end_datetime))
                 current_date += timedelta(weeks=1)
@@ -1050,16 +2437,19 @@ def make_pie_chart_for_group(df_group):
     
     enrl_capacity = df_group['Enrl Capacity'].iloc[0]
     room_capacity = df_group['Room Capacity'].iloc[0]
+
+    # The pie only depends on the two capacities, equal pairs share one cached figure
+    return cached_figure(('group', type(enrl_capacity).__name__, enrl_capacity, room_capacity), lambda: make_capacity_pie_from_template(enrl_capacity, room_capacity))
+
+# Function to get the slice values, slice names and title of the capacity pie of a group
+def capacity_pie_parts(enrl_capacity, room_capacity):
     difference = room_capacity - enrl_capacity
     
-    colors = ['darkblue', 'royalblue']
-    
     # Over capacity case:
     if enrl_capacity > room_capacity:
         values = [room_capacity, enrl_capacity - room_capacity]
         names = ['Room Capacity', 'Over Capacity']
-        title = "Exceed room capacity for " + abs(difference).astype(str)
-        showlegend = True
+        title = "Exceed room capacity for " + str(abs(difference))
     
     # Normal case:
     else:
@@ -1067,6 +2457,27 @@ def make_pie_chart_for_group(df_group):
         names = ['Enrolled Capacity', 'Remaining Room Capacity']
         title = "Capacity Overview"
 
+    return values, names, title
+
+# Function to build the capacity pie of a group by filling its values and title into a template figure.
+# Only two templates exist (over capacity or not), so px.pie runs at most twice.
+def make_capacity_pie_from_template(enrl_capacity, room_capacity):
+    over_capacity = bool(enrl_capacity > room_capacity)
+    template = cached_figure(('group-template', over_capacity), lambda: make_capacity_pie(2, 1) if over_capacity else make_capacity_pie(1, 2))
+
+    # Only the values and title are replaced, everything else is shared with the template
+    values, names, title = capacity_pie_parts(enrl_capacity, room_capacity)
+    return dict(
+        template,
+        data=[dict(template['data'][0], values=np.asarray(values).tolist())],
+        layout=dict(template['layout'], title=dict(template['layout']['title'], text=title)),
+    )
+
+# Function to build the capacity pie of a group from its enrolment and room capacity
+def make_capacity_pie(enrl_capacity, room_capacity):
+    colors = ['darkblue', 'royalblue']
+    values, names, title = capacity_pie_parts(enrl_capacity, room_capacity)
+
     # Create the pie chart.
     fig = px.pie(
         names=names,
@@ -1102,132 +2513,677 @@ def make_pie_chart_for_group(df_group):
 
     return fig
 
-@app.callback(
-    Output('last-clicked-button', 'data'),
-    [Input('show-pie-chart', 'n_clicks'),
-     Input('show-table', 'n_clicks'),
-     Input('show-timeline', 'n_clicks'),
-     Input('show-calendar', 'n_clicks')],
-    [State('last-clicked-button', 'data')]
-)
-def update_last_clicked_button(show_pie_n_clicks, show_table_n_clicks, show_timeline_n_clicks,show_calendar_n_clicks, data):
-    ctx = dash.callback_context
+# Bounded LRU cache of capacity pie figures, stored as plain figure dicts ready to send to the browser.
+# Keys hold only the values the figure depends on, so repeated capacity pairs are built once.
+PIE_FIGURE_CACHE_SIZE = int(os.getenv('PIE_FIGURE_CACHE_SIZE', 2048))
+pie_figure_cache = OrderedDict()
+pie_figure_cache_lock = threading.Lock()
+
+# Function to get a figure from the pie cache, building it on a miss.
+# The returned dict is shared between callers and must not be modified.
+def cached_figure(key, build):
+    with pie_figure_cache_lock:
+        figure = pie_figure_cache.get(key)
+        if figure is not None:
+            pie_figure_cache.move_to_end(key)
+    if figure is not None:
+        pie_figure_cache_requests.inc(('hit',))
+        return figure
+
+    pie_figure_cache_requests.inc(('miss',))
+    figure = build()
+    if isinstance(figure, go.Figure):
+        figure = figure.to_plotly_json()
+    with pie_figure_cache_lock:
+        pie_figure_cache[key] = figure
+        while len(pie_figure_cache) > PIE_FIGURE_CACHE_SIZE:
+            pie_figure_cache.popitem(last=False)
+    return figure
+
+# The pie renders run in forked background processes, whose cache entries are lost with them.
+# The two templates are built here at import so every render process inherits them.
+make_capacity_pie_from_template(1, 2)
+make_capacity_pie_from_template(2, 1)
+
+# Number of classes in each page of the capacity overview
+capacity_page_size = 25
+
+# Function to summarise the classes (one row per course, component, location and meeting time) for the capacity overview.
+# Over capacity classes come first, then the fullest rooms.
+def capacity_groups(df_filtered):
+    df_filtered = df_filtered.assign(
+        Component=display_text(df_filtered['Component']) if 'Component' in df_filtered.columns else 'Unknown',
+    )
+    keys = ['Course Descr', 'Component', 'Location', 'Meeting Start', 'Meeting End', 'Subject', 'Catalog']
+    groups = df_filtered.groupby(keys, observed=True).agg({'Enrl Capacity': 'max', 'Room Capacity': 'max'}).reset_index()
+
+    groups['Label'] = (groups['Subject'].astype(str) + ' ' + groups['Catalog'].astype(str) + ' ' + groups['Component'] + '<br>' +
+                       groups['Location'].astype(str) + ' ' + groups['Meeting Start'].map(format_time_of_day) + '-' + groups['Meeting End'].map(format_time_of_day))
+    groups['Over Capacity'] = groups['Enrl Capacity'] > groups['Room Capacity']
+    groups['Utilisation'] = groups['Enrl Capacity'] / groups['Room Capacity'].where(groups['Room Capacity'] > 0)
+    groups = groups.sort_values(['Over Capacity', 'Utilisation'], ascending=False, kind='stable')
+    return groups[['Course Descr', 'Label', 'Enrl Capacity', 'Room Capacity', 'Over Capacity']]
+
+# Function to draw one page of the capacity overview as a bullet chart: the room capacity as a wide grey bar
+# with the enrolment drawn inside it, red when the class does not fit in the room
+def make_capacity_figure(rows):
+    labels = [f"<b>{row['Course Descr']}</b> {row['Label']}" for row in rows]
+    enrolment = [row['Enrl Capacity'] for row in rows]
+    room_capacity = [row['Room Capacity'] for row in rows]
+    colors = ['red' if row['Over Capacity'] else 'royalblue' for row in rows]
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=labels, x=room_capacity, orientation='h', name='Room Capacity', marker_color='lightgrey', width=0.8))
+    fig.add_trace(go.Bar(y=labels, x=enrolment, orientation='h', name='Enrol Capacity', marker_color=colors, width=0.4,
+                         text=[f"{enrl} / {room}" for enrl, room in zip(enrolment, room_capacity)], textposition='outside'))
+    fig.update_layout(
+        barmode='overlay',
+        height=120 + 45 * len(rows),
+        margin=dict(l=20, r=20, t=40, b=20),
+        yaxis=dict(autorange='reversed', automargin=True),
+        xaxis_title='Seats',
+        legend=dict(orientation='h', y=1.02, yanchor='bottom'),
+        title='Capacity Overview (over capacity classes in red)',
+    )
+    return fig
 
-    if not ctx.triggered:
-        button_id = 'No clicks yet'
-    else:
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+# Function to create the capacity overview: every class in one paginated figure
+@timed('render')
+def create_capacity_overview(df_filtered, page):
+    if df_filtered.empty:
+        return html.Div("No data available for the selected range.", style={'fontSize': '16px'})
+
+    rows = capacity_groups(df_filtered).to_dict('records')
+    page_count = max(1, -(-len(rows) // capacity_page_size))
+    over_capacity = sum(row['Over Capacity'] for row in rows)
 
-    data['button'] = button_id
-    return data
+    return html.Div([
+        html.H4(f"{len(rows)} classes, {over_capacity} over room capacity", style={'textAlign': 'left', 'margin-left': '20px'}),
+        dcc.Store(id={'type': 'capacity-data', 'index': page}, data=rows),
+        dbc.Pagination(id={'type': 'capacity-pagination', 'index': page}, max_value=page_count, active_page=1, fully_expanded=False,
+                       style={'margin-left': '20px'}) if page_count > 1 else html.Div(),
+        dcc.Graph(id={'type': 'capacity-graph', 'index': page}, figure=make_capacity_figure(rows[:capacity_page_size])),
+    ])
 
-# Callback function to update the calendar view based on user inputs
 @app.callback(
-    Output('calendar-view', 'children'),
-    [Input('last-clicked-button', 'data')],  
-    [
-        State('stored-data', 'children'),
-        State('term-dropdown', 'value'),
-        State('course-dropdown', 'value'),
-        State('date-range-picker', 'start_date'),
-        State('date-range-picker', 'end_date')
-    ]
+    Output({'type': 'capacity-graph', 'index': MATCH}, 'figure'),
+    [Input({'type': 'capacity-pagination', 'index': MATCH}, 'active_page')],
+    [State({'type': 'capacity-data', 'index': MATCH}, 'data')],
+    prevent_initial_call=True
 )
-def update_calendar(last_clicked_button_data, stored_data, selected_terms, selected_course, start_date, end_date):
-    
-    # Speed testing
-    start_time_speed = time.time()
-    
-    if not stored_data:
+# Function to show another page of the capacity overview
+@instrumented_callback
+def update_capacity_page(active_page, rows):
+    if not rows or not active_page:
         raise PreventUpdate
-    
+    first = (active_page - 1) * capacity_page_size
+    return make_capacity_figure(rows[first:first + capacity_page_size])
+
+# Width of the time slots of the utilisation heatmap in minutes, and the hours of the day it covers
+utilisation_slot_minutes = 15
+utilisation_day_start = 7
+utilisation_day_end = 22
+utilisation_slots_per_day = (utilisation_day_end - utilisation_day_start) * 60 // utilisation_slot_minutes
+
+# Date ranges up to this many days are shown day by day, longer ones are folded into weekdays
+utilisation_max_dates = 14
+
+# Function to build the occupancy matrix of the rooms: rooms x days x time slots, True where the room has a class
+# during the slot. Every class marks +1 at its first slot and -1 after its last one, and a cumulative sum over
+# the slots fills the intervals, so all rooms of all buildings are placed at once without a loop per group.
+def occupancy_matrix(room_codes, day_codes, start_minutes, end_minutes, n_rooms, n_days):
+    day_start = utilisation_day_start * 60
+    first_slot = np.clip((start_minutes - day_start) // utilisation_slot_minutes, 0, utilisation_slots_per_day)
+    end_slot = np.clip(-((day_start - end_minutes) // utilisation_slot_minutes), 0, utilisation_slots_per_day)
+    keep = end_slot > first_slot
+
+    boundaries = np.zeros((n_rooms, n_days, utilisation_slots_per_day + 1), dtype=np.int32)
+    np.add.at(boundaries, (room_codes[keep], day_codes[keep], first_slot[keep]), 1)
+    np.add.at(boundaries, (room_codes[keep], day_codes[keep], end_slot[keep]), -1)
+    return np.cumsum(boundaries, axis=2)[:, :, :-1] > 0
+
+# Function to turn the occupancy matrix into utilisation percentages per room, day column and slot.
+# Short ranges keep one column per date; longer ones give the share of each weekday's dates the slot is booked.
+def utilisation_by_day(occupied, days):
+    if len(days) <= utilisation_max_dates:
+        return occupied * 100.0, [day.strftime('%a %d %b') for day in days]
+
+    weekdays = days.weekday.values
+    weekday_dates = np.zeros((len(days), 7))
+    weekday_dates[np.arange(len(days)), weekdays] = 1
+    percentages = np.einsum('rds,dw->rws', occupied, weekday_dates) * 100.0 / weekday_dates.sum(axis=0)[None, :, None].clip(min=1)
+
+    # Weekdays without any class in the selection are left out
+    shown = occupied.any(axis=(0, 2)) @ weekday_dates > 0
+    return percentages[:, shown], [calendar.day_abbr[weekday] for weekday in np.flatnonzero(shown)]
+
+# Function to create the utilisation view: one heatmap of the share of time every room is booked,
+# with a summary row per building, over the selected or the term date range
+@timed('render')
+def create_utilisation_view(dataset, filters, start_date, end_date):
+    sections = dataset.select(filters, columns=view_columns['show-utilisation'])
+    sections = sections[sections['Location'].notna()]
+    if sections.empty:
+        return html.Div("No data available for the selected range.", style={'fontSize': '16px'})
 
-    if last_clicked_button_data['button'] != 'show-calendar':
-        return None
+    # Every room of the selection gets a row, also the rooms without classes in the range
+    rooms = pd.DataFrame({
+        'Building': sections['Building Descr'].astype(object).fillna('Unknown').values,
+        'Location': sections['Location'].astype(str).values,
+    }).drop_duplicates('Location').sort_values(['Building', 'Location'], ignore_index=True)
+
+    days = pd.date_range(start_date.normalize(), end_date.normalize())
+    events = explode_occurrences(sections, dataset.occurrences_between(start_date, end_date))
+    starts = events['Start Datetime']
+    occupied = occupancy_matrix(
+        pd.Index(rooms['Location']).get_indexer(events['Location'].astype(str)),
+        ((starts.dt.normalize() - days[0]) // pd.Timedelta(days=1)).values,
+        (starts.dt.hour * 60 + starts.dt.minute).values,
+        (events['End Datetime'].dt.hour * 60 + events['End Datetime'].dt.minute).values,
+        len(rooms), len(days),
+    )
+    percentages, day_labels = utilisation_by_day(occupied, days)
+    if not day_labels:
+        return html.Div("No classes in the selected range.", style={'fontSize': '16px'})
+
+    # Building rows are the mean of their rooms, each followed by its rooms
+    n_rooms, n_columns = percentages.shape[0], percentages.shape[1] * percentages.shape[2]
+    room_rows = percentages.reshape(n_rooms, n_columns)
+    building_codes, buildings = pd.factorize(rooms['Building'])
+    building_rows = np.zeros((len(buildings), n_columns))
+    np.add.at(building_rows, building_codes, room_rows)
+    building_rows /= np.bincount(building_codes)[:, None]
+
+    row_labels, row_values = [], []
+    for building_code, building in enumerate(buildings):
+        row_labels.append(f"<b>{building}</b> ({building_rows[building_code].mean():.0f}%)")
+        row_values.append(building_rows[building_code])
+        for room_code in np.flatnonzero(building_codes == building_code):
+            row_labels.append(f"{rooms['Location'].iloc[room_code]} ({room_rows[room_code].mean():.0f}%)")
+            row_values.append(room_rows[room_code])
+
+    slot_times = pd.date_range('1900-01-01 %02d:00' % utilisation_day_start, periods=utilisation_slots_per_day, freq=f'{utilisation_slot_minutes}min').strftime('%H:%M')
+    column_labels = [f"{day} {slot_time}" for day in day_labels for slot_time in slot_times]
+
+    fig = go.Figure(go.Heatmap(
+        z=np.vstack(row_values), x=column_labels, y=row_labels,
+        zmin=0, zmax=100, colorscale='Blues', colorbar=dict(title='% booked'),
+        hovertemplate='%{y}<br>%{x}<br>%{z:.0f}% booked<extra></extra>',
+    ))
+    for day_number in range(1, len(day_labels)):
+        fig.add_vline(x=day_number * utilisation_slots_per_day - 0.5, line_color='grey', line_width=1)
+    fig.update_layout(
+        height=160 + 22 * len(row_labels),
+        margin=dict(l=20, r=20, t=60, b=20),
+        yaxis=dict(autorange='reversed', automargin=True),
+        xaxis=dict(side='top', tickangle=-90, nticks=len(day_labels) * (utilisation_day_end - utilisation_day_start) // 2),
+        title=f"Room utilisation, {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d} ({utilisation_slot_minutes} minute slots)",
+    )
 
-    start_date = pd.to_datetime(start_date) if start_date else None
-    end_date = pd.to_datetime(end_date) if end_date else None
+    return html.Div([
+        html.H4(f"{len(rooms)} rooms in {len(buildings)} buildings", style={'textAlign': 'left', 'margin-left': '20px'}),
+        dcc.Graph(figure=fig),
+    ])
+
+# Function to find the class occurrences of different sections booked into the same room at overlapping times.
+# Sections in the same room with the same start and end are co-taught or cross-listed: like the workload view,
+# they are taken as one combined booking and never clash with each other.
+# The occurrences are sorted by room and start once and swept in that order: a class clashes when it starts before
+# the latest end of the earlier classes in its room, and only those classes are compared with the earlier ones that
+# can still be running, found by binary search. The cost is O(n log n) for n occurrences plus the number of clashes.
+# Returns the positions in events of both occurrences of every clash with the start and end of the overlap.
+def find_room_conflicts(events):
+    rooms = pd.factorize(events['Location'])[0]
+    starts = events['Start Datetime'].values.astype('datetime64[m]').astype(np.int64)
+    ends = events['End Datetime'].values.astype('datetime64[m]').astype(np.int64)
+    sections = events['Section'].values
+    positions = np.flatnonzero((rooms >= 0) & (ends > starts))
+    if len(positions) == 0:
+        return pd.DataFrame({'First': [], 'Second': [], 'Overlap Start': [], 'Overlap End': []}, dtype='int64')
+
+    order = positions[np.lexsort((starts[positions], rooms[positions]))]
+    rooms, starts, ends, sections = rooms[order], starts[order], ends[order], sections[order]
+
+    # Latest end of the earlier classes of the same room at every step of the sweep
+    no_class = np.iinfo(np.int64).min
+    earlier_end = np.r_[no_class, pd.Series(ends).groupby(rooms).cummax().values[:-1]]
+    earlier_end[np.r_[True, rooms[1:] != rooms[:-1]]] = no_class
+    clashing = np.flatnonzero(starts < earlier_end)
+
+    # Rooms follow each other on one minute axis, so a class can only overlap the earlier classes of its room
+    # starting less than the longest class before it
+    longest = (ends - starts).max()
+    first_start = starts.min()
+    keys = rooms * (starts.max() - first_start + 1 + longest) + (starts - first_start)
+    window_start = np.searchsorted(keys, keys[clashing] - longest, side='right')
+    window_sizes = clashing - window_start
+    later = np.repeat(clashing, window_sizes)
+    earlier = np.arange(window_sizes.sum()) - np.repeat(np.cumsum(window_sizes) - window_sizes - window_start, window_sizes)
+
+    combined = (starts[earlier] == starts[later]) & (ends[earlier] == ends[later])
+    overlapping = (ends[earlier] > starts[later]) & (sections[earlier] != sections[later]) & ~combined
+    earlier, later = earlier[overlapping], later[overlapping]
+    return pd.DataFrame({
+        'First': order[earlier],
+        'Second': order[later],
+        'Overlap Start': starts[later],
+        'Overlap End': np.minimum(ends[earlier], ends[later]),
+    })
+
+# Columns of the sections the conflict report reads
+conflict_columns = ['Location', 'Subject / Catalogue', 'Component', 'Class Nbr', 'Course Descr']
+
+# Function to build the room conflict report of a location page selection: every pair of sections clashing
+# in a room of the selection, per weekday and overlap time, with the number and range of the clashing dates.
+# All sections of the selected terms in those rooms are checked, also those outside the tech team filter.
+def conflict_report(dataset, spec):
+    rooms = dataset.select(spec['filters'], columns=['Location'])['Location'].dropna().unique()
+    sections = dataset.select({'Term': spec['filters']['Term']}, columns=conflict_columns)
+    sections = sections[sections['Location'].isin(rooms)]
+
+    if spec['start_date'] and spec['end_date']:
+        occurrences = dataset.occurrences_between(pd.Timestamp(spec['start_date']), pd.Timestamp(spec['end_date']))
+    else:
+        occurrences = dataset.occurrences
+    events = explode_occurrences(sections, occurrences)
+    clashes = find_room_conflicts(events)
+
+    # Each pair of sections is reported in the same order on every date
+    first, second = clashes['First'].values, clashes['Second'].values
+    swap = events['Section'].values[first] > events['Section'].values[second]
+    first, second = np.where(swap, second, first), np.where(swap, first, second)
+
+    class_labels = (events['Subject / Catalogue'].astype(str) + ' ' + display_text(events['Component']) + ' #' + display_text(events['Class Nbr'])).values
+    course_labels = display_text(events['Course Descr']).values
+    overlap_start = pd.to_datetime(clashes['Overlap Start'].values.astype('datetime64[m]'))
+    overlap_end = pd.to_datetime(clashes['Overlap End'].values.astype('datetime64[m]'))
+    report = pd.DataFrame({
+        'Location': events['Location'].astype(str).values[first],
+        'Day': overlap_start.strftime('%a'),
+        'Overlap': overlap_start.strftime('%H:%M') + '-' + overlap_end.strftime('%H:%M'),
+        'Class A': class_labels[first],
+        'Course A': course_labels[first],
+        'Class B': class_labels[second],
+        'Course B': course_labels[second],
+        'Date': overlap_start.strftime('%Y-%m-%d'),
+    })
+    report = report.groupby(['Location', 'Day', 'Overlap', 'Class A', 'Course A', 'Class B', 'Course B'], sort=False).agg(
+        **{'Clashes': ('Date', 'size'), 'First Date': ('Date', 'min'), 'Last Date': ('Date', 'max')}
+    ).reset_index()
+    return report.sort_values(['Location', 'First Date', 'Overlap'], kind='stable', ignore_index=True)
+
+# Function to create the conflicts view: the clashes of the selection in one table with a download of the report
+@timed('render')
+def create_conflicts_view(dataset, spec):
+    report = conflict_report(dataset, spec)
+    if report.empty:
+        return html.Div("No room conflicts found for the selected rooms and dates.", style={'fontSize': '25px'})
 
-    if not start_date or not end_date or start_date > end_date:
-        return html.Div("Please select a valid date range.", style={'fontSize': '25px'})
+    return html.Div([
+        html.H4(f"{len(report)} clashing class pairs in {report['Location'].nunique()} rooms, {report['Clashes'].sum()} class dates affected",
+                style={'textAlign': 'left', 'margin-left': '20px'}),
+        dcc.Store(id='conflicts-spec', data=spec),
+        html.Button('Download Report', id='conflicts-download-button', n_clicks=0,
+                    style={'background-color': '#3b405c', 'color': 'white', 'margin-left': '20px', 'margin-bottom': '10px', 'fontSize': 16}),
+        dcc.Download(id='conflicts-download'),
+        dash_table.DataTable(
+            data=report.to_dict('records'),
+            columns=[{'name': column, 'id': column} for column in report.columns],
+            style_table={'width': '100%', 'minWidth': '100%', 'padding': '10px', 'overflowX': 'auto', 'color': '#262B3D', 'fontSize': 14},
+            sort_action='native',
+            filter_action='native',
+            page_action='native',
+            page_size=table_page_size,
+        ),
+    ])
 
-    df = pd.read_json(stored_data, orient='split')
-    df['Start Date'] = pd.to_datetime(df['Start Date'], errors='coerce')
-    df['End Date'] = pd.to_datetime(df['End Date'], errors='coerce')
-    df['Location'] = df['Building Descr'] + ' ' + df['Room']
-    if selected_terms:
-        df = df[df['Term'].isin(selected_terms)]
-    
-    if selected_course:
-        df = df[df['Course Descr'].isin(selected_course)]
-        # df = df[df['Course Descr'] == selected_course]
+@app.callback(
+    Output('conflicts-download', 'data'),
+    [Input('conflicts-download-button', 'n_clicks')],
+    [State('conflicts-spec', 'data')],
+    prevent_initial_call=True
+)
+# Function to send the room conflict report of the shown selection as a CSV file
+@instrumented_callback
+def download_conflicts(n_clicks, spec):
+    dataset = get_dataset(spec['upload_id']) if spec else None
+    if not n_clicks or dataset is None:
+        raise PreventUpdate
+    return dcc.send_data_frame(conflict_report(dataset, spec).to_csv, 'room_conflicts.csv', index=False)
+
+# Columns of the sections the workload view reads
+workload_columns = ['Tech Team', 'Location']
+
+# Function to aggregate the workload of every tech team per week or per day: contact hours, sessions,
+# distinct rooms and the peak number of sessions running at the same time. Sections taught together
+# (same tech team, room and time) are one session. The peak comes from a sweep over the start (+1)
+# and end (-1) events of each team in time order, ends first so back to back sessions do not overlap.
+def workload_table(sessions, period):
+    starts = sessions['Start Datetime']
+    if period == 'week':
+        period_starts = starts.dt.normalize() - pd.to_timedelta(starts.dt.weekday, unit='D')
+    else:
+        period_starts = starts.dt.normalize()
+    sessions = sessions.assign(**{
+        'Period': period_starts.values,
+        'Hours': (sessions['End Datetime'] - starts).dt.total_seconds().values / 3600,
+    })
+    table = sessions.groupby(['Tech Team', 'Period'], sort=True).agg(
+        **{'Contact Hours': ('Hours', 'sum'), 'Sessions': ('Hours', 'size'), 'Rooms': ('Location', 'nunique')}
+    )
 
-    all_months_calendar = []
+    # Every team's events net to zero, so one running sum over the teams in order gives each team's concurrency
+    team_codes = pd.factorize(sessions['Tech Team'])[0]
+    times = np.concatenate([sessions['Start Datetime'].values, sessions['End Datetime'].values])
+    deltas = np.repeat(np.array([1, -1], dtype=np.int64), len(sessions))
+    event_teams = np.tile(team_codes, 2)
+    order = np.lexsort((deltas, times, event_teams))
+    running = np.cumsum(deltas[order])
+    session_starts = order < len(sessions)
+    peaks = pd.DataFrame({
+        'Tech Team': sessions['Tech Team'].values[order[session_starts]],
+        'Period': sessions['Period'].values[order[session_starts]],
+        'Peak Concurrent': running[session_starts],
+    }).groupby(['Tech Team', 'Period'])['Peak Concurrent'].max()
+
+    table = table.join(peaks).reset_index()
+    table['Contact Hours'] = table['Contact Hours'].round(2)
+    table['Period'] = table['Period'].dt.strftime('%Y-%m-%d')
+    return table
+
+# Function to draw the workload as one bar chart of contact hours per period, stacked by tech team,
+# with the sessions, rooms and peak concurrency of each bar on hover
+def make_workload_figure(rows, period):
+    table = pd.DataFrame(rows)
+    fig = go.Figure()
+    for tech_team, team_rows in table.groupby('Tech Team', sort=True):
+        fig.add_trace(go.Bar(
+            x=team_rows['Period'], y=team_rows['Contact Hours'], name=tech_team,
+            customdata=team_rows[['Sessions', 'Rooms', 'Peak Concurrent']].values,
+            hovertemplate='<b>' + tech_team + '</b><br>%{x}<br>%{y:.1f} contact hours<br>%{customdata[0]} sessions in %{customdata[1]} rooms<br>'
+                          'peak %{customdata[2]} at the same time<extra></extra>',
+        ))
+    fig.update_layout(
+        barmode='stack',
+        height=520,
+        margin=dict(l=20, r=20, t=60, b=20),
+        xaxis=dict(type='category', title='Week starting' if period == 'week' else 'Date'),
+        yaxis_title='Contact hours',
+        legend=dict(orientation='h', y=1.02, yanchor='bottom'),
+        title=f"Tech team workload per {period}",
+    )
+    return fig
 
-    # Loop through each month in the selected date range
-    current_month_start = pd.to_datetime(start_date.strftime('%Y-%m-01'))
-    
-    while current_month_start <= end_date:
-        current_month_end = current_month_start + MonthEnd(1)
-        days_in_month = pd.date_range(start=current_month_start, end=current_month_end)
-        month_events = {date.date(): set() for date in days_in_month}
-
-        for _, row in df.iterrows():
-            course_dates = generate_course_dates(row, weekday_mapping)
-            for start_datetime, end_datetime in course_dates:
-                # Check if event falls within current month
-                if current_month_start.date() <= start_datetime.date() <= current_month_end.date():
-                    event_key = (row['Course Descr'], row['Component'], row['Location'], start_datetime, end_datetime, row['Tech Team'], row['Class Nbr'], row['Pattern Nbr'])
-                    month_events[start_datetime.date()].add(event_key)
-
-        calendar_rows = []
-        first_day_of_calendar = current_month_start - timedelta(days=current_month_start.weekday())
-        
-        # Style for each calendar cell
-        cell_style = {
-            'vertical-align': 'top',
-            'border': '2px solid #ddd',
-            'padding': '5px',
-            'width': '200px',  
-            'height': '100px'  
+# Function to create the workload view of the tech teams over the selected or the term date range.
+# Both periods are aggregated once; switching between them only redraws the chart.
+@timed('render')
+def create_workload_view(dataset, filters, start_date, end_date):
+    sections = dataset.select(filters, start_date, end_date, workload_columns)
+    sessions = explode_occurrences(sections, dataset.occurrences_between(start_date, end_date))
+    if sessions.empty:
+        return html.Div("No data available for the selected range.", style={'fontSize': '16px'})
+
+    sessions = pd.DataFrame({
+        'Tech Team': display_text(sessions['Tech Team']).values if 'Tech Team' in sessions.columns else 'None',
+        'Location': sessions['Location'].astype(str).values,
+        'Start Datetime': sessions['Start Datetime'].values,
+        'End Datetime': sessions['End Datetime'].values,
+    }).drop_duplicates()
+    rows = {period: workload_table(sessions, period).to_dict('records') for period in ('week', 'day')}
+
+    return html.Div([
+        html.H4(f"{len(sessions)} sessions of {sessions['Tech Team'].nunique()} tech teams, {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}",
+                style={'textAlign': 'left', 'margin-left': '20px'}),
+        dcc.RadioItems(id='workload-period', options=[{'label': ' Per week', 'value': 'week'}, {'label': ' Per day', 'value': 'day'}],
+                       value='week', inline=True, inputStyle={'margin-left': '20px'}),
+        dcc.Store(id='workload-data', data=rows),
+        dcc.Graph(id='workload-graph', figure=make_workload_figure(rows['week'], 'week')),
+        dash_table.DataTable(
+            id='workload-table',
+            data=rows['week'],
+            columns=[{'name': column, 'id': column} for column in ['Tech Team', 'Period', 'Contact Hours', 'Sessions', 'Rooms', 'Peak Concurrent']],
+            style_table={'width': '100%', 'minWidth': '100%', 'padding': '10px', 'overflowX': 'auto', 'color': '#262B3D', 'fontSize': 14},
+            sort_action='native',
+            filter_action='native',
+            page_action='native',
+            page_size=table_page_size,
+        ),
+    ])
+
+@app.callback(
+    [Output('workload-graph', 'figure'), Output('workload-table', 'data')],
+    [Input('workload-period', 'value')],
+    [State('workload-data', 'data')],
+    prevent_initial_call=True
+)
+# Function to show the workload per week or per day
+@instrumented_callback
+def update_workload_period(period, rows):
+    if not rows or period not in rows:
+        raise PreventUpdate
+    return make_workload_figure(rows[period], period), rows[period]
+
+app.clientside_callback(
+    """
+    function(show_pie_n_clicks, show_table_n_clicks, show_timeline_n_clicks, show_calendar_n_clicks, show_capacity_n_clicks, show_utilisation_n_clicks, show_conflicts_n_clicks, show_workload_n_clicks, data) {
+        const triggered = dash_clientside.callback_context.triggered;
+        const button_id = triggered.length ? triggered[0].prop_id.split('.')[0] : '';
+        if (!button_id) {
+            return {button: null, clicks: 0};
         }
+        // Every click is counted, so clicking the shown view again renders it again
+        return {button: button_id, clicks: ((data && data.clicks) || 0) + 1};
+    }
+    """,
+    Output('last-clicked-button', 'data'),
+    [Input('show-pie-chart', 'n_clicks'),
+     Input('show-table', 'n_clicks'),
+     Input('show-timeline', 'n_clicks'),
+     Input('show-calendar', 'n_clicks'),
+     Input('show-capacity', 'n_clicks'),
+     Input('show-utilisation', 'n_clicks'),
+     Input('show-conflicts', 'n_clicks'),
+     Input('show-workload', 'n_clicks')],
+    [State('last-clicked-button', 'data')]
+)
 
-        days_to_display = (current_month_end - first_day_of_calendar).days + 1
-        for day_number in range(days_to_display):
-            current_day = first_day_of_calendar + timedelta(days=day_number)
-            weekday_name = calendar.day_abbr[current_day.weekday()]  
-            if current_day.weekday() == 0: 
-                week_cells = []
-            if current_month_start <= current_day <= current_month_end:
-                events_for_day = month_events.get(current_day.date(), [])
-                cell_content = [html.Span(current_day.day, style={'font-weight': 'bold'})] + [format_event(event) for event in events_for_day]
-            else:
-                cell_content = ""
-            week_cells.append(html.Td(cell_content, style=cell_style))
-            if current_day.weekday() == 6:  
-                calendar_rows.append(html.Tr(week_cells))
-                
-       
-        if current_day.weekday() != 6:
+# Columns identifying a calendar event, in the order format_event expects
+calendar_event_columns = ['Course Descr', 'Component', 'Location', 'Start Datetime', 'End Datetime', 'Tech Team', 'Class Nbr', 'Pattern Nbr']
+
+# Function to bucket the calendar events into their (year, month, day) cell with a single groupby
+def bucket_events_by_day(events_df):
+    events = events_df[calendar_event_columns].drop_duplicates().sort_values(['Start Datetime', 'Course Descr'])
+    start_datetimes = events['Start Datetime']
+    grouped = events.groupby([start_datetimes.dt.year, start_datetimes.dt.month, start_datetimes.dt.day], sort=False)
+    return {date(*day): list(group.itertuples(index=False, name=None)) for day, group in grouped}
+
+# Function to build the calendar grid for one month from the day buckets
+def build_month_calendar(month_start, events_by_day):
+    month_end = month_start + MonthEnd(1)
+    first_day_of_calendar = month_start - timedelta(days=month_start.weekday())
+    last_day_of_calendar = month_end + timedelta(days=6 - month_end.weekday())
+
+    # Style for each calendar cell
+    cell_style = {
+        'vertical-align': 'top',
+        'border': '2px solid #ddd',
+        'padding': '5px',
+        'width': '200px',  
+        'height': '100px'  
+    }
+
+    calendar_rows = []
+    week_cells = []
+    for current_day in pd.date_range(first_day_of_calendar, last_day_of_calendar):
+        if month_start <= current_day <= month_end:
+            events_for_day = events_by_day.get(current_day.date(), [])
+            cell_content = [html.Span(current_day.day, style={'font-weight': 'bold'})] + [format_event(event) for event in events_for_day]
+        else:
+            cell_content = ""
+        week_cells.append(html.Td(cell_content, style=cell_style))
+        if current_day.weekday() == 6:
             calendar_rows.append(html.Tr(week_cells))
+            week_cells = []
 
-        month_calendar_html = html.Table([
-            html.Thead(html.Tr([html.Th(day) for day in calendar.day_abbr])),  
-            html.Tbody(calendar_rows)
-        ], style={'margin-left': 'auto', 'margin-right': 'auto', 'width': 'fit-content'})
+    month_calendar_html = html.Table([
+        html.Thead(html.Tr([html.Th(day) for day in calendar.day_abbr])),  
+        html.Tbody(calendar_rows)
+    ], style={'margin-left': 'auto', 'margin-right': 'auto', 'width': 'fit-content'})
 
-        all_months_calendar.append(html.H2(current_month_start.strftime('%B %Y'), style={'textAlign': 'center', 'margin-top' : '20px'}))
-        all_months_calendar.append(month_calendar_html)
-        
-        current_month_start = current_month_end + timedelta(days=1)
+    return [
+        html.H2(month_start.strftime('%B %Y'), style={'textAlign': 'center', 'margin-top' : '20px'}),
+        month_calendar_html,
+    ]
 
-    # Speed testing 
-    end_time_speed = time.time()
-    processing_time = end_time_speed - start_time_speed
-    print(f"Calendar Processing Time: {processing_time:.3f} seconds")
+# Function to build the calendar view of the selected sections for every month in the date range.
+# Shared by the course and location pages.
+@timed('render')
+def build_calendar(dataset, df, start_date, end_date):
+    first_month_start = pd.Timestamp(start_date.year, start_date.month, 1)
+    last_month_end = pd.Timestamp(end_date.year, end_date.month, 1) + MonthEnd(1)
+
+    # Only the occurrences shown in the displayed months are joined and bucketed
+    occurrences = dataset.occurrences_between(first_month_start, last_month_end + timedelta(days=1) - timedelta(microseconds=1))
+    events_by_day = bucket_events_by_day(explode_occurrences(df, occurrences))
+
+    all_months_calendar = []
+    for month_start in pd.date_range(first_month_start, last_month_end, freq='MS'):
+        all_months_calendar.extend(build_month_calendar(month_start, events_by_day))
 
     return html.Div(all_months_calendar, style={'textAlign': 'center', 'fontSize': 14})
 
+# The calendar shows one month at a time. 'current-month' holds the displayed month and the calendar spec
+# (upload ID, filters and date range) so the month buttons can render other months of the same selection.
+# Rendered months are cached and the adjacent months are prefetched in the background.
+CALENDAR_CACHE_SIZE = int(os.getenv('CALENDAR_CACHE_SIZE', 64))
+calendar_month_cache = OrderedDict()
+calendar_month_cache_lock = threading.Lock()
+calendar_prefetch_executor = ThreadPoolExecutor(max_workers=2)
+
+# Function to give a forked background callback process fresh locks, so a lock held by another
+# thread of the server at fork time cannot block the render. The metrics reset their own locks.
+def reset_locks_after_fork():
+    global dataset_registry_lock, parse_cache_lock, feed_cache_lock, pie_figure_cache_lock, calendar_month_cache_lock, calendar_prefetch_executor
+    dataset_registry_lock = threading.Lock()
+    parse_cache_lock = threading.Lock()
+    feed_cache_lock = threading.Lock()
+    pie_figure_cache_lock = threading.Lock()
+    calendar_month_cache_lock = threading.Lock()
+    # The prefetch threads are not copied into the child, neither must the executor's locks be
+    calendar_prefetch_executor = ThreadPoolExecutor(max_workers=2)
+
+os.register_at_fork(after_in_child=reset_locks_after_fork)
+
+# Function to list the months ('YYYY-MM-01') covered by the date range of a calendar spec
+def calendar_months(spec):
+    start_date = pd.Timestamp(spec['start_date'])
+    end_date = pd.Timestamp(spec['end_date'])
+    months = pd.date_range(pd.Timestamp(start_date.year, start_date.month, 1), pd.Timestamp(end_date.year, end_date.month, 1), freq='MS')
+    return [month.strftime('%Y-%m-%d') for month in months]
+
+# Function to render one month of a calendar spec, from the cache when it was rendered or prefetched before
+def render_calendar_month(spec, month):
+    spec = {key: value for key, value in spec.items() if key != 'date'}
+    key = (json.dumps(spec, sort_keys=True, default=str), month)
+    with calendar_month_cache_lock:
+        content = calendar_month_cache.get(key)
+        if content is not None:
+            calendar_month_cache.move_to_end(key)
+            return content
+
+    dataset = get_dataset(spec['upload_id'])
+    if dataset is None:
+        return html.Div("The uploaded file is no longer available, please upload it again.", style={'fontSize': '25px'})
+
+    # The location page only shows sections with a class in the date range
+    if spec['restrict_sections']:
+        df = dataset.select(spec['filters'], pd.Timestamp(spec['start_date']), pd.Timestamp(spec['end_date']), calendar_event_columns)
+    else:
+        df = dataset.select(spec['filters'], columns=calendar_event_columns)
+
+    month_start = pd.Timestamp(month)
+    content = build_calendar(dataset, df, month_start, month_start)
+
+    with calendar_month_cache_lock:
+        calendar_month_cache[key] = content
+        while len(calendar_month_cache) > CALENDAR_CACHE_SIZE:
+            calendar_month_cache.popitem(last=False)
+    return content
+
+# Function to render the displayed month and the months before and after it in the background;
+# months already in the cache are not rendered again
+def prefetch_calendar_months(spec, month):
+    months = calendar_months(spec)
+    index = months.index(month)
+    for neighbour in months[max(index - 1, 0):index + 2]:
+        calendar_prefetch_executor.submit(render_calendar_month, spec, neighbour)
+
+# Function to build the calendar view: previous/next month buttons and the first month of the date range.
+# It runs in a background callback process, so the months are prefetched into the cache of the
+# server process by prefetch_calendar once the view is shown.
+def create_calendar_view(spec):
+    months = calendar_months(spec)
+    month = months[0]
+    content = render_calendar_month(spec, month)
+
+    button_style = {'background-color': '#3b405c', 'color': 'white', 'fontSize': 16, 'margin': '0 10px'}
+    calendar_view = html.Div([
+        html.Div([
+            html.Button('Previous Month', id='calendar-prev-month', n_clicks=0, disabled=True, style=button_style),
+            html.Button('Next Month', id='calendar-next-month', n_clicks=0, disabled=len(months) == 1, style=button_style),
+        ], style={'textAlign': 'center', 'margin-top': '20px'}),
+        html.Div(content, id='calendar-month'),
+    ])
+    return calendar_view, dict(spec, date=month)
+
+@app.callback(
+    [
+        Output('calendar-month', 'children'),
+        Output('current-month', 'data', allow_duplicate=True),
+        Output('calendar-prev-month', 'disabled'),
+        Output('calendar-next-month', 'disabled'),
+    ],
+    [
+        Input('calendar-prev-month', 'n_clicks'),
+        Input('calendar-next-month', 'n_clicks'),
+    ],
+    [State('current-month', 'data')],
+    prevent_initial_call=True
+)
+# Function to move the calendar to the previous or next month
+@instrumented_callback
+def change_calendar_month(prev_n_clicks, next_n_clicks, current_month):
+    if not current_month or 'upload_id' not in current_month:
+        raise PreventUpdate
+
+    ctx = dash.callback_context
+    button_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
+
+    months = calendar_months(current_month)
+    index = months.index(current_month['date']) if current_month['date'] in months else 0
+    if button_id == 'calendar-prev-month':
+        index = max(index - 1, 0)
+    elif button_id == 'calendar-next-month':
+        index = min(index + 1, len(months) - 1)
+
+    month = months[index]
+    content = render_calendar_month(current_month, month)
+    return content, dict(current_month, date=month), index == 0, index == len(months) - 1
+
+@app.callback(
+    Output('calendar-prefetch', 'data'),
+    [Input('current-month', 'data')],
+    prevent_initial_call=True
+)
+# Function to prefetch the months around the displayed calendar month in the server process,
+# after the first render of a calendar and after every move to another month
+@instrumented_callback
+def prefetch_calendar(current_month):
+    if not current_month or 'upload_id' not in current_month:
+        raise PreventUpdate
+    prefetch_calendar_months(current_month, current_month['date'])
+    return dash.no_update
+
 # Function to format event HTML
 def format_event(event_key):
     course_descr, component, location, start_datetime, end_datetime, tech_team, class_nbr, pattern_nbr = event_key
@@ -1239,24 +3195,24 @@ def format_event(event_key):
     else:
         class_pattern = "None"
 
+    # Line breaks are rendered with 'pre-line' so each event is only two components
     event_style = {
         'border-top': '1px solid #ccc',  
         'padding-top': '5px',  
         'margin-top': '5px',  
         'padding-bottom': '5px', 
+        'white-space': 'pre-line',
     }
 
+    tech_team_str = f"Tech Team: {tech_team}" if pd.notna(tech_team) and tech_team else "Tech Team: None"
+    component = component if pd.notna(component) else None
     return html.Div([
-        html.Span(f"{course_descr}"),
-        html.Br(),
+        f"{course_descr}\n",
         html.Span('🟡', style={'margin-right': '5px'}),
-        html.Span(f"{component}, {class_pattern}"),
-        html.Br(),
-        html.Span(location),
-        html.Br(),
-        html.Span(f"{start_datetime.strftime('%H:%M')} - {end_datetime.strftime('%H:%M')}"),
-        html.Br(),
-        html.Span(f"Tech Team: {tech_team}" if tech_team else "Tech Team: None"),
+        f"{component}, {class_pattern}\n"
+        f"{location}\n"
+        f"{start_datetime.strftime('%H:%M')} - {end_datetime.strftime('%H:%M')}\n"
+        f"{tech_team_str}",
     ], style=event_style)
 
 # Function to parse time string into a time object
@@ -1266,13 +3222,41 @@ def parse_time(t):
     except ValueError:
         return datetime.strptime(t, '%H:%M').time()  
 
-# callback for select location page
-@app.callback(
-    [
-        Output('location-output-div', 'children'),
-        Output('location-date-range-picker', 'min_date_allowed'),
-        Output('location-date-range-picker', 'max_date_allowed'),
-    ],
+# Callback to turn the location page selections into a selection and a view request, dropping
+# half-picked date ranges, selections without a chosen view and requests equal to the one already shown
+app.clientside_callback(
+    """
+    function(selected_terms, selected_tech_teams, selected_buildings, selected_rooms, start_date, end_date, last_clicked_button_data, upload_id, previous_selection, previous_request) {
+        if (!selected_terms || !selected_terms.length || Boolean(start_date) !== Boolean(end_date)) {
+            throw dash_clientside.PreventUpdate;
+        }
+        const selection = {
+            'terms': selected_terms,
+            'tech_teams': selected_tech_teams || null,
+            'buildings': selected_buildings || null,
+            'rooms': selected_rooms || null,
+            'start_date': start_date || null,
+            'end_date': end_date || null
+        };
+        // The view request adds the view, its click count and the upload; no render is requested before a view is chosen
+        const button = last_clicked_button_data ? last_clicked_button_data.button : null;
+        const request = button ? Object.assign({}, selection, {
+            'button': button,
+            'clicks': last_clicked_button_data.clicks,
+            'upload_id': upload_id || null
+        }) : null;
+        const selection_changed = JSON.stringify(selection) !== JSON.stringify(previous_selection);
+        const request_changed = request !== null && JSON.stringify(request) !== JSON.stringify(previous_request);
+        if (!selection_changed && !request_changed) {
+            throw dash_clientside.PreventUpdate;
+        }
+        return [
+            selection_changed ? selection : dash_clientside.no_update,
+            request_changed ? request : dash_clientside.no_update
+        ];
+    }
+    """,
+    [Output('location-selection', 'data'), Output('location-view-request', 'data')],
     [
         Input('location-term-dropdown', 'value'),
         Input('tech-team-dropdown', 'value'),
@@ -1280,83 +3264,166 @@ def parse_time(t):
         Input('room-dropdown', 'value'),
         Input('location-date-range-picker', 'start_date'),
         Input('location-date-range-picker', 'end_date'),
-        Input('show-pie-chart', 'n_clicks'),
         Input('last-clicked-button', 'data'),
+        Input('stored-data', 'children'),
     ],
-    [State('stored-data', 'children')]
+    [State('location-selection', 'data'), State('location-view-request', 'data')]
+)
+
+@app.callback(
+    [
+        Output('location-date-range-picker', 'min_date_allowed'),
+        Output('location-date-range-picker', 'max_date_allowed'),
+    ],
+    [Input('location-term-dropdown', 'value'), Input('stored-data', 'children')]
+)
+# Function to set the date bounds of the selected terms on the location page, from the metadata computed at upload
+@instrumented_callback
+def set_location_date_bounds(selected_terms, stored_data):
+    dataset = get_dataset(stored_data)
+    if dataset is None or not selected_terms:
+        return None, None
+    _, min_date, max_date = term_summary(dataset.metadata, selected_terms)
+    if min_date is None:
+        return None, None
+    return min_date.strftime('%Y-%m-%d'), max_date.strftime('%Y-%m-%d')
+
+# callback for select location page
+@app.callback(
+    [
+        Output('location-output-div', 'children'),
+        Output('calendar-view', 'children', allow_duplicate=True),
+        Output('current-month', 'data', allow_duplicate=True),
+    ],
+    [Input('location-view-request', 'data')],
+    [State('stored-data', 'children')],
+    prevent_initial_call=True,
+    background=True,
+    running=[(Output('location-progress', 'style'), progress_bar_visible, progress_bar_hidden)],
+    progress=[Output('location-progress', 'value'), Output('location-progress', 'max')],
+    progress_default=[0, 1],
+    cancel=[Input('url', 'pathname'), Input('reset-button', 'n_clicks'), Input('upload-data', 'contents')],
 )
-def update_location(selected_terms, selected_tech_teams, selected_buildings, selected_rooms, start_date, end_date, show_pie_n_clicks, last_clicked_button_data, stored_data):
-    if not stored_data or not selected_terms:
+@instrumented_callback
+def update_location(set_progress, view_request, stored_data):
+    # Resolve the upload ID to the registered DataFrame
+    dataset = get_dataset(stored_data)
+    if dataset is None or not view_request or not view_request['button']:
         raise PreventUpdate
-    
-    # Load data into DataFrame 
-    df = pd.read_json(stored_data, orient='split', dtype={'Class_Pat': object})
-    
-    df = df[df['Term'].isin(selected_terms)]
-    
-    if df.empty or 'Start Date' not in df.columns or 'End Date' not in df.columns:
-        return [], [html.Div("Start Date and/or End Date column not found.")], None, None
-    
-    # Convert date strings to datetime objects
-    df['Start Date'] = pd.to_datetime(df['Start Date'], errors='coerce')
-    df['End Date'] = pd.to_datetime(df['End Date'], errors='coerce')
 
-    # Generate course dates
-    df['Course Dates'] = df.apply(lambda row: generate_course_dates(row, weekday_mapping), axis=1)
+    selected_terms = view_request['terms']
+    selected_tech_teams = view_request['tech_teams']
+    selected_buildings = view_request['buildings']
+    selected_rooms = view_request['rooms']
+    start_date = view_request['start_date']
+    end_date = view_request['end_date']
+    last_clicked = view_request['button']
+
+    # Date bounds of the selected terms come from the metadata computed at upload
+    df = dataset.df
+    _, min_date, max_date = term_summary(dataset.metadata, selected_terms)
+    
+    if min_date is None or 'Start Date' not in df.columns or 'End Date' not in df.columns:
+        return [html.Div("Start Date and/or End Date column not found.")], None, dash.no_update
 
-    min_date_allowed = df['Start Date'].min().strftime('%Y-%m-%d')
-    max_date_allowed = df['End Date'].max().strftime('%Y-%m-%d')
+    if 'Meeting Days' not in df.columns:
+        return [html.Div("Weekday columns not found.")], None, dash.no_update
 
-    for day in weekday_mapping:
-            if day not in df.columns:
-                return [html.Div(f"{day} column not found.")], None, None
+    # The calendar filters and renders one month at a time by itself
+    if last_clicked == 'show-calendar':
+        start_date = pd.to_datetime(start_date) if start_date else None
+        end_date = pd.to_datetime(end_date) if end_date else None
 
-    children = []
-    
-    # Filter by selected technical teams
-    if selected_tech_teams:
-        df = df[df['Tech Team'].isin(selected_tech_teams) | df['Tech Team'].isna() if '' in selected_tech_teams else df['Tech Team'].isin(selected_tech_teams)]
+        if not start_date or not end_date or start_date > end_date:
+            return [], html.Div("Please select a valid date range.", style={'fontSize': '25px'}), dash.no_update
 
-    # Filter by selected buildings and rooms
-    if selected_buildings:
-        df = df[df['Building Descr'].isin(selected_buildings)]
-    
-        if selected_rooms:
+        start_date = start_date.replace(hour=0, minute=0, second=0)
+        end_date = end_date.replace(hour=23, minute=59, second=59)
 
-            df = df[df['Room'].isin(selected_rooms) | (selected_rooms == ['All'])]
+        # Filter data based on the location page selections
+        filters = location_filters(selected_terms, selected_tech_teams, selected_buildings, selected_rooms)
+        if len(dataset.matching_rows(filters, start_date, end_date)) == 0:
+            error_message = "No courses found in the selected date range."
+            print(error_message)
+            return [], html.Div(error_message, style={'fontSize': '25px'}), dash.no_update
+
+        spec = {
+            'upload_id': stored_data,
+            'filters': filters,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'restrict_sections': True,
+        }
+        set_progress((1, 2))
+        calendar_view, current_month = create_calendar_view(spec)
+        return [], calendar_view, current_month
+
+    # Room utilisation and tech team workload cover the selected dates, or the whole of the selected terms
+    if last_clicked in ('show-utilisation', 'show-workload'):
+        start_date = pd.to_datetime(start_date) if start_date else min_date
+        end_date = pd.to_datetime(end_date) if end_date else max_date
+        if start_date > end_date:
+            return [html.Div("Please select a valid date range.", style={'fontSize': '25px'})], None, dash.no_update
+
+        filters = location_filters(selected_terms, selected_tech_teams, selected_buildings, selected_rooms if selected_buildings else None)
+        set_progress((1, 2))
+        create_view = create_utilisation_view if last_clicked == 'show-utilisation' else create_workload_view
+        children = create_view(dataset, filters, start_date.replace(hour=0, minute=0, second=0), end_date.replace(hour=23, minute=59, second=59))
+        return children, None, dash.no_update
+
+    # Room conflicts are checked over the selected dates, or the whole of the selected terms
+    if last_clicked == 'show-conflicts':
+        start_date = pd.to_datetime(start_date).replace(hour=0, minute=0, second=0) if start_date else None
+        end_date = pd.to_datetime(end_date).replace(hour=23, minute=59, second=59) if end_date else None
+        spec = {
+            'upload_id': stored_data,
+            'filters': location_filters(selected_terms, selected_tech_teams, selected_buildings, selected_rooms if selected_buildings else None),
+            'start_date': start_date.isoformat() if start_date else None,
+            'end_date': end_date.isoformat() if end_date else None,
+        }
+        set_progress((1, 2))
+        return create_conflicts_view(dataset, spec), None, dash.no_update
 
-            if start_date and end_date:
-                start_date = pd.to_datetime(start_date).replace(hour=0, minute=0, second=0)
-                end_date = pd.to_datetime(end_date).replace(hour=23, minute=59, second=59)
-                
-                mask = df['Course Dates'].apply(
-                    lambda dates: any(start_date <= d[0] <= end_date for d in dates) if isinstance(dates, list) else False
-                )
-                if not mask.any():
+    children = []
+    
+    # Filter by selected technical teams, buildings and rooms (rooms only apply with a building).
+    # Progress steps: filter, expand, render
+    filters = location_filters(selected_terms, selected_tech_teams, selected_buildings, selected_rooms if selected_buildings else None)
+    columns = view_columns.get(last_clicked)
+    df = dataset.select(filters, columns=columns)
+
+    occurrences = dataset.occurrences
+    if selected_buildings and selected_rooms and start_date and end_date:
+        start_date = pd.to_datetime(start_date).replace(hour=0, minute=0, second=0)
+        end_date = pd.to_datetime(end_date).replace(hour=23, minute=59, second=59)
+        
+        df = dataset.select(filters, start_date, end_date, columns)
+        occurrences = dataset.occurrences_between(start_date, end_date)
+        if df.empty:
 
-                    error_message = "No courses found in the selected date range."
-                    print(error_message)
-                    return [html.Div(error_message, style={'fontSize': '25px'})], min_date_allowed, max_date_allowed
+            error_message = "No courses found in the selected date range."
+            print(error_message)
+            return [html.Div(error_message, style={'fontSize': '25px'})], None, dash.no_update
+    set_progress((1, 3))
 
-                df = df[mask]
-            
-            if 'Course Dates' in df.columns:
-                df = df.explode('Course Dates')
+    # One row per class occurrence, read from the occurrences generated at upload
+    df = explode_occurrences(df, occurrences)
+    set_progress((2, 3))
 
     if df.empty:
-        return [html.Div("No data available for selected criteria.")], None, None    
-
-    last_clicked = last_clicked_button_data['button']
+        return [html.Div("No data available for selected criteria.")], None, dash.no_update
 
     # Generate visualizations 
     if last_clicked == 'show-pie-chart':
         children = create_piecharts_for_locations(df, start_date, end_date)
     elif last_clicked == 'show-table':
-        children = create_table_for_locations(df, start_date, end_date)
+        children = create_table_for_locations(df, start_date, end_date, {'upload_id': stored_data, 'filters': filters})
     elif last_clicked == 'show-timeline':
         children = create_timeline_for_selected_location(df, start_date, end_date)
+    elif last_clicked == 'show-capacity':
+        children = create_capacity_overview(df, 'location')
 
-    return children, min_date_allowed, max_date_allowed
+    return children, None, dash.no_update
 
 # callback function to set building option
 @app.callback(
@@ -1366,14 +3433,14 @@ def update_location(selected_terms, selected_tech_teams, selected_buildings, sel
         Input('tech-team-dropdown', 'value')
     ]
 )
+@instrumented_callback
 def set_building_options(stored_data, selected_tech_teams):
-    if stored_data:
-        df = pd.read_json(stored_data, orient='split')
-        
-        if selected_tech_teams:
-            df = df[(df['Tech Team'].isin(selected_tech_teams)) | (df['Tech Team'].isna() if '' in selected_tech_teams else df['Tech Team'].isin(selected_tech_teams))]
+    dataset = get_dataset(stored_data)
+    if dataset is not None:
+        location_tree = dataset.metadata['location_tree']
+        tech_teams = selected_tech_teams if selected_tech_teams else location_tree.keys()
 
-        buildings = sorted(df['Building Descr'].dropna().unique()) 
+        buildings = sorted({building for tech_team in tech_teams for building in location_tree.get(tech_team, {})})
         options = [{'label': building, 'value': building} for building in buildings]
         
         return options
@@ -1389,31 +3456,32 @@ def set_building_options(stored_data, selected_tech_teams):
     ],
     [State('stored-data', 'children')]
 )
+@instrumented_callback
 def set_room_options(selected_buildings, selected_tech_teams, stored_data):
-    if not stored_data:
+    dataset = get_dataset(stored_data)
+    if dataset is None:
         return []
 
-    df = pd.read_json(stored_data, orient='split')
-
     if selected_tech_teams:
-        df = df[(df['Tech Team'].isin(selected_tech_teams)) | (df['Tech Team'].isna() if '' in selected_tech_teams else df['Tech Team'].isin(selected_tech_teams))]
-
-        if selected_buildings:
-            df = df[df['Building Descr'].isin(selected_buildings)]
+        location_tree = dataset.metadata['location_tree']
+        room_names = set()
+        for tech_team in selected_tech_teams:
+            buildings = location_tree.get(tech_team, {})
+            for building in (selected_buildings if selected_buildings else buildings):
+                room_names.update(buildings.get(building, []))
 
     else:
         return [{'label': 'Select a building first', 'value': 'None'}]
 
     rooms = [{'label': 'All', 'value': 'All'}] + \
-            [{'label': room, 'value': room} for room in df['Room'].dropna().unique()]
+            [{'label': room, 'value': room} for room in sorted(room_names)]
 
     return rooms
 
 # Function to create pie charts for selected locations
+@timed('render')
 def create_piecharts_for_locations(df_filtered, start_date, end_date):
     
-    # Speed testing
-    start_time_speed = time.time()
 
     if start_date is None or end_date is None:
         return html.Div("")
@@ -1421,10 +3489,7 @@ def create_piecharts_for_locations(df_filtered, start_date, end_date):
     start_date = pd.to_datetime(start_date).date()
     end_date = pd.to_datetime(end_date).date()
     
-    #  create Location field for grouping
-    df_filtered['Location'] = df_filtered['Building Descr'] + ' ' + df_filtered['Room']
-    df_filtered['Subject / Catalogue'] = df_filtered['Subject'].astype(str) + ' ' + df_filtered['Catalog'].astype(str) 
-    grouped_df = df_filtered.groupby(['Course Descr', 'Location', 'Room Capacity', 'Enrl Capacity', 'Meeting Start', 'Meeting End', 'Subject / Catalogue'])
+    grouped_df = df_filtered.groupby(['Course Descr', 'Location', 'Room Capacity', 'Enrl Capacity', 'Meeting Start', 'Meeting End', 'Subject / Catalogue'], observed=True)
 
     # Container to hold all the pie chart divs
     charts_container = html.Div(style={'display': 'flex', 'flex-wrap': 'wrap'})
@@ -1433,9 +3498,9 @@ def create_piecharts_for_locations(df_filtered, start_date, end_date):
     # Iterate each data to the defined grouping
     for (course_descr, location, room_capacity, enrl_capacity, start_time, end_time, subject_catalogue), group in grouped_df:
         
-        current_group_dates = group['Course Dates'].explode()
-        current_group_dates = current_group_dates[current_group_dates.apply(lambda d: start_date <= d.date() <= end_date)]
-        sorted_dates = sorted(current_group_dates.dt.date.unique())
+        current_group_dates = group['Start Datetime'].dt.date
+        current_group_dates = current_group_dates[(current_group_dates >= start_date) & (current_group_dates <= end_date)]
+        sorted_dates = sorted(current_group_dates.unique())
         dates_str = ', '.join([date.strftime('%Y-%m-%d') for date in sorted_dates])
         
         # Generate the pie chart figure with grouped data
@@ -1446,7 +3511,7 @@ def create_piecharts_for_locations(df_filtered, start_date, end_date):
         capacity_str = f"Enrol Capacity: {enrl_capacity}, Room Capacity: {room_capacity}"
 
         tech_team = group['Tech Team'].iloc[0] if 'Tech Team' in group.columns else None
-        tech_team_info = f"Tech Team: {tech_team}" if tech_team else "Tech Team: None"
+        tech_team_info = f"Tech Team: {tech_team}" if pd.notna(tech_team) and tech_team else "Tech Team: None"
         course_descr_str = group['Course Descr'].iloc[0]
         subject_catalogue = group['Subject / Catalogue'].iloc[0]
 
@@ -1454,7 +3519,7 @@ def create_piecharts_for_locations(df_filtered, start_date, end_date):
         chart_div = html.Div([
             html.H2(location),
             html.H4(subject_catalogue),
-            html.H4(f"Course: {course_descr_str}, Time: {start_time[:5]} - {end_time[:5]}"),
+            html.H4(f"Course: {course_descr_str}, Time: {format_time_of_day(start_time)} - {format_time_of_day(end_time)}"),
             html.H4(f"Dates: {dates_str}"),
             html.H4(tech_team_info),
             html.H4(capacity_str),
@@ -1465,10 +3530,6 @@ def create_piecharts_for_locations(df_filtered, start_date, end_date):
 
     charts_container.children = children
 
-    # Speed testing 
-    end_time_speed = time.time()
-    processing_time = end_time_speed - start_time_speed
-    print(f"Pie Chart Processing Time: {processing_time:.3f} seconds")
 
     return charts_container
 
@@ -1477,65 +3538,14 @@ def make_pie_chart_for_group_location(df_group):
     
     enrl_capacity = df_group['Enrl Capacity'].iloc[0]
     room_capacity = df_group['Room Capacity'].iloc[0]
-    difference = room_capacity - enrl_capacity
-    
-    colors = ['darkblue', 'royalblue']
-    
-    # Over capacity case:
-    if enrl_capacity > room_capacity:
-        values = [room_capacity, enrl_capacity - room_capacity]
-        names = ['Room Capacity', 'Over Capacity']
-       
-        
-        title = "Exceed room capacity for " + abs(difference).astype(str)
-        showlegend = True
-    
-    # Normal case:
-    else:
-        values = [enrl_capacity, room_capacity - enrl_capacity]
-        names = ['Enrolled Capacity', 'Remaining Room Capacity']
-        title = "Capacity Overview"
-
-    # Create the pie chart.
-    fig = px.pie(
-        names=names,
-        values=values,
-        title=title,   
-    )
-    fig.update_traces(marker=dict(colors=colors))
-  
-    if enrl_capacity > room_capacity:
-        fig.update_traces(textinfo='none')
-        fig.add_annotation(
-            text="Over Capacity!",
-            x=0.5,
-            y=0.5,
-            showarrow=False,
-            font=dict(size=25, color='Red')
-        )
-        
-        fig.add_annotation(
-            x=0.2,  
-            y=1.1, 
-            xref="paper",
-            yref="paper",
-            showarrow=False,
-            text="⚠️", 
-            font=dict(
-                size=20,  
-                color="yellow"  
-            ),
 
-        )
-        fig.update_layout(showlegend=True)
-
-    return fig
+    # The pie only depends on the two capacities, equal pairs share one cached figure
+    return cached_figure(('group', type(enrl_capacity).__name__, enrl_capacity, room_capacity), lambda: make_capacity_pie_from_template(enrl_capacity, room_capacity))
 
 # Function to create table for selected locations 
-def create_table_for_locations(df_filtered, start_date, end_date):
+@timed('render')
+def create_table_for_locations(df_filtered, start_date, end_date, table_spec):
     
-    # Speed testing
-    start_time_speed = time.time()
     
     if df_filtered.empty:
         return html.Div("No data available for the selected range.", style={'fontSize': '16px'})
@@ -1544,23 +3554,7 @@ def create_table_for_locations(df_filtered, start_date, end_date):
     start_date = pd.to_datetime(start_date)
     end_date = pd.to_datetime(end_date)
 
-    df_filtered = df_filtered[df_filtered['Course Dates'].apply(lambda x: 
-        (x[0] if x[0] is not None else pd.to_datetime('1900-01-01')) <= end_date and 
-        (x[1] if x[1] is not None else pd.to_datetime('2100-01-01')) >= start_date
-    )]
-
-    # Format Course Dates for display in the table
-    if 'Course Dates' in df_filtered.columns:
-        df_filtered['Course Dates'] = df_filtered['Course Dates'].apply(lambda x: f"{x[0].strftime('%Y-%m-%d %H:%M')}-{x[1].strftime('%H:%M')}" if isinstance(x, tuple) else x)
-    else:
-        return html.Div("The 'Course Dates' column could not be found.")
-
-    # Concatenate columns for display
-    df_filtered['Subject / Catalogue'] = df_filtered['Subject'].astype(str) + ' ' + df_filtered['Catalog'].astype(str)
-    df_filtered['Location'] = df_filtered['Building Descr'] + ' ' + df_filtered['Room']
-
-    if 'Tech Team' not in df_filtered.columns:
-        df_filtered['Tech Team'] = 'None'
+    df_filtered = format_table_rows(df_filtered, start_date, end_date)
 
     # Columns for the table data
     table_columns = [
@@ -1573,80 +3567,42 @@ def create_table_for_locations(df_filtered, start_date, end_date):
         {"name": "Tech Team", "id": "Tech Team"},
     ]
 
-    df_filtered.sort_values('Course Descr', inplace=True)
-
     children = []
     table_container_style = {'margin-bottom': '20px', 'overflowX': 'auto'}
-    table_style = {'width': '100%', 'minWidth': '100%', 'padding': '10px', 'overflowX': 'auto', 'color': '#262B3D', 'fontSize': 14}
 
-    for course_descr, group in df_filtered.groupby('Course Descr'):
-        group = group.sort_values(by='Course Dates')
+    for course_descr, group in df_filtered.groupby('Course Descr', observed=True):
         # Create a subheader 
         children.append(html.H3(course_descr, style={'textAlign': 'left'}))
 
-        # Create a table for each group
-        table = dash_table.DataTable(
-            data=group.to_dict('records'),
-            columns=table_columns,
-            style_table=table_style,
-            filter_action="none", 
-            sort_action="native",    
-            page_action="native",   
-            page_size=30,
-        )
+        # Create a table for each group, the browser only receives the visible page
+        table = create_server_table(group, table_columns, table_spec, course_descr, start_date, end_date)
         
         children.append(html.Div(table, style=table_container_style))
         children.append(html.Hr(style={'marginTop': '20px', 'marginBottom': '20px'}))
 
-    # Speed testing 
-    end_time_speed = time.time()
-    processing_time = end_time_speed - start_time_speed
-    print(f"Table Processing Time: {processing_time:.3f} seconds")
 
     return html.Div(children, style={'overflowX': 'auto'})
 
 
 # Function to create a timeline for selected location
+@timed('render')
 def create_timeline_for_selected_location(df,start_date, end_date):
     
-    # Speed testing
-    start_time_speed = time.time()
 
     if df.empty:
         return html.Div("No data available for the selected range.", style={'fontSize': '16px'})
 
 
      
-    specific_columns = ['Building', 'Building Descr', 'Room', 'Course Descr', 'Course ID']
-    df[specific_columns] = df[specific_columns].fillna('Unknown')
- 
-    charts_container = html.Div(style={'display': 'flex', 'flex-wrap': 'wrap'})
-
-    children = []
-
     start_date = pd.to_datetime(start_date).date()  
     end_date = pd.to_datetime(end_date).date()
 
-    # exploded_df = df.explode('Course Dates')
-    df['Course Date'] = df['Course Dates'].apply(lambda x: pd.to_datetime(x[0]))
-
-    df['Course Date'] = pd.to_datetime(df['Course Date']).dt.date
-
-    df = df[(df['Course Date'] >= start_date) & 
-                                    (df['Course Date'] <= end_date)]
-    
-    # Concatenate columns for display
-    df['Subject / Catalogue'] = df['Subject'].astype(str) + ' ' + df['Catalog'].astype(str)
-    df['Location'] = df['Building Descr'] + ' ' + df['Room']
+    df = select_course_dates(df, start_date, end_date)
 
     if 'Tech Team' not in df.columns:
-        df['Tech Team'] = 'None'
-
-    
+        df = df.assign(**{'Tech Team': 'None'})
 
-    #  create Location field for grouping
-    df['Location'] = df['Building Descr'] + ' ' + df['Room']
-    grouped_df = df.groupby(['Course Descr', 'Location', 'Meeting Start', 'Meeting End'])
+    grouped_df = df.groupby(['Course Descr', 'Location', 'Meeting Start', 'Meeting End'], observed=True)
 
 
     # Container to hold all the timeline divs
@@ -1657,10 +3613,6 @@ def create_timeline_for_selected_location(df,start_date, end_date):
     # Iterate each data to the defined grouping
     for (course_descr, location,start_time, end_time), group in grouped_df:
         
-        current_group_dates = group['Course Dates'].explode()
-        current_group_dates = current_group_dates[current_group_dates.apply(lambda d: start_date <= d.date() <= end_date)]
-         
-        
         # Generate the Timeline figure with grouped data
         fig = make_timeline_for_group_location(group)
         
@@ -1677,10 +3629,6 @@ def create_timeline_for_selected_location(df,start_date, end_date):
 
     charts_container.children = children
 
-    # Speed testing 
-    end_time_speed = time.time()
-    processing_time = end_time_speed - start_time_speed
-    print(f"Timeline Processing Time: {processing_time:.3f} seconds")
 
     return charts_container
     
@@ -1692,17 +3640,8 @@ def make_timeline_for_group_location(df):
     if len(df) != 0:
         df = df.drop_duplicates(subset=['Pattern Nbr', 'Course Date', 'Meeting Start'], keep='first')
     # ///////////////////////////////////////////////////////////////////////
-        time_format = "%H:%M:%S"  # Adjust the format if necessary
-        
-        df['Meeting Start'] = pd.to_datetime(df['Meeting Start'].astype(str), format=time_format)
-        df['Meeting End'] = pd.to_datetime(df['Meeting End'].astype(str), format=time_format)
-        
-         
-         
-        df['Location'] =   '<b>' + df['Building Descr'] + ' '+df['Room'].astype(str)  
-      
-        df['Class Detail'] = '<b>' + df['Course Descr'].astype(str)  +'</b>,  ' + df['Component'].astype(str) +', ' +df['Class_Pat'].astype(str) +'<br><b>Date</b>: ' + df['Course Date'].astype(str)+ '</b> Tech Team: <b>'+  df['Tech Team'].astype(str)+'</b>' 
-        df['Class Time'] = '  <b>Time</b>: ' + df['Meeting Start'].dt.strftime('%H:%M') + ' - ' + df['Meeting End'].dt.strftime('%H:%M')
+        df = place_on_timeline(df)
+        df = df.assign(**{'Class Detail': '<b>' + df['Course Descr'].astype(str)  +'</b>,  ' + df['Class Label'].astype(str) +'<br><b>Date</b>: ' + df['Course Date'].astype(str)+ '</b> Tech Team: <b>'+  display_text(df['Tech Team'])+'</b>'})
 
         df = df.sort_values(by=['Course Date', 'Meeting Start'], ascending=True)                                
 
@@ -1718,8 +3657,8 @@ def make_timeline_for_group_location(df):
         else:
             chart_height= len(tmp_df['Class Detail']) * 67
 
-        location_title=df['Location'].unique()[0]                               
-        fig = px.timeline(df, x_start='Meeting Start', x_end='Meeting End', y='Class Detail', color = "Class Detail", text='Class Time', height=chart_height ,title=location_title)
+        location_title='<b>' + str(df['Location'].iloc[0])
+        fig = px.timeline(df, x_start='Meeting Start', x_end='Meeting End', y='Class Detail', color = "Class Detail", text='Time Label', height=chart_height ,title=location_title, labels={'Time Label': 'Class Time'})
                                          
 
         fig.update_layout(showlegend=False, xaxis_title="Time", hovermode=False)
@@ -1748,147 +3687,6 @@ def make_timeline_for_group_location(df):
 
     return fig
 
-# Function for display calendar: location filter 
-@app.callback(
-    Output('calendar-view', 'children', allow_duplicate=True),
-    [
-        Input('last-clicked-button', 'data'),  
-        Input('location-term-dropdown', 'value'),
-        Input('tech-team-dropdown', 'value'),
-        Input('building-dropdown', 'value'),
-        Input('room-dropdown', 'value'),
-        Input('location-date-range-picker', 'start_date'),
-        Input('location-date-range-picker', 'end_date'),
-    ],
-    [State('stored-data', 'children')],
-    prevent_initial_call='initial_duplicate'
-)
-def update_calendar_for_location(last_clicked_button_data, selected_terms, selected_tech_teams, selected_buildings, selected_rooms, start_date, end_date, stored_data):
-    
-    # Speed testing
-    start_time_speed = time.time()
-
-    if not stored_data:
-        raise PreventUpdate
-    
-    if last_clicked_button_data['button'] != 'show-calendar':
-        return None
-
-    start_date = pd.to_datetime(start_date) if start_date else None
-    end_date = pd.to_datetime(end_date) if end_date else None
-
-    if not start_date or not end_date or start_date > end_date:
-        return html.Div("Please select a valid date range.", style={'fontSize': '25px'})
-
-    df = pd.read_json(stored_data, orient='split')
-    df['Start Date'] = pd.to_datetime(df['Start Date'], errors='coerce')
-    df['End Date'] = pd.to_datetime(df['End Date'], errors='coerce')
-    df['Course Dates'] = df.apply(lambda row: generate_course_dates(row, weekday_mapping), axis=1)
-    df['Location'] = df['Building Descr'] + ' ' + df['Room']
-
-    min_date_allowed = df['Start Date'].min().strftime('%Y-%m-%d')
-    max_date_allowed = df['End Date'].max().strftime('%Y-%m-%d')
-
-    # Filter data based on the location page selections
-    if selected_terms:
-        df = df[df['Term'].isin(selected_terms)]
-
-    if selected_tech_teams and 'None' not in selected_tech_teams:
-        df = df[df['Tech Team'].isin(selected_tech_teams) | df['Tech Team'].isna() if '' in selected_tech_teams else df['Tech Team'].isin(selected_tech_teams)]
-
-    if selected_buildings:
-        df = df[df['Building Descr'].isin(selected_buildings)]
-
-    if selected_rooms:
-        df = df[df['Room'].isin(selected_rooms) | (selected_rooms == ['All'])]
-    
-    if not start_date or not end_date or start_date > end_date:
-        return html.Div("Please select a valid date range.", style={'fontSize': '25px'})
-
-    if start_date and end_date:
-        start_date = pd.to_datetime(start_date).replace(hour=0, minute=0, second=0)
-        end_date = pd.to_datetime(end_date).replace(hour=23, minute=59, second=59)
-                
-        mask = df['Course Dates'].apply(
-                    lambda dates: any(start_date <= d[0] <= end_date for d in dates) if isinstance(dates, list) else False
-                )
-        if not mask.any():
-
-            error_message = "No courses found in the selected date range."
-            print(error_message)
-            return [html.Div(error_message, style={'fontSize': '25px'})], min_date_allowed, max_date_allowed
-
-        df = df[mask]
-            
-        if 'Course Dates' in df.columns:
-            df = df.explode('Course Dates')
-
-    if df.empty:
-        return html.Div("No data available for selected criteria.")
-    
-    all_months_calendar = []
-
-    # Loop through each month in the selected date range
-    current_month_start = pd.to_datetime(start_date.strftime('%Y-%m-01'))
-    while current_month_start <= end_date:
-        current_month_end = current_month_start + MonthEnd(1)
-        days_in_month = pd.date_range(start=current_month_start, end=current_month_end)
-        month_events = {date.date(): set() for date in days_in_month}
-
-        for _, row in df.iterrows():
-            course_dates = generate_course_dates(row, weekday_mapping)
-            for start_datetime, end_datetime in course_dates:
-                # Check if event falls within current month
-                if current_month_start.date() <= start_datetime.date() <= current_month_end.date():
-                    event_key = (row['Course Descr'], row['Component'], row['Location'], start_datetime, end_datetime, row['Tech Team'], row['Class Nbr'], row['Pattern Nbr'])
-                    month_events[start_datetime.date()].add(event_key)
-
-        calendar_rows = []
-        first_day_of_calendar = current_month_start - timedelta(days=current_month_start.weekday())
-
-        # Style for each calendar cell
-        cell_style = {
-            'vertical-align': 'top',
-            'border': '2px solid #ddd',
-            'padding': '5px',
-            'width': '200px',
-            'height': '100px'
-        }
-
-        days_to_display = (current_month_end - first_day_of_calendar).days + 1
-        for day_number in range(days_to_display):
-            current_day = first_day_of_calendar + timedelta(days=day_number)
-            if current_day.weekday() == 0:
-                week_cells = []
-            if current_month_start <= current_day <= current_month_end:
-                events_for_day = month_events.get(current_day.date(), [])
-                cell_content = [html.Span(current_day.day, style={'font-weight': 'bold'})] + [format_event(event) for event in events_for_day]
-            else:
-                cell_content = ""
-            week_cells.append(html.Td(cell_content, style=cell_style))
-            if current_day.weekday() == 6:
-                calendar_rows.append(html.Tr(week_cells))
-
-        if current_day.weekday() != 6:
-            calendar_rows.append(html.Tr(week_cells))
-
-        month_calendar_html = html.Table([
-            html.Thead(html.Tr([html.Th(day) for day in calendar.day_abbr])),
-            html.Tbody(calendar_rows)
-        ], style={'margin-left': 'auto', 'margin-right': 'auto', 'width': 'fit-content'})
-
-        all_months_calendar.append(html.H2(current_month_start.strftime('%B %Y'), style={'textAlign': 'center', 'margin-top': '20px'}))
-        all_months_calendar.append(month_calendar_html)
-
-        current_month_start = current_month_end + timedelta(days=1)
-
-    # Speed testing 
-    end_time_speed = time.time()
-    processing_time = end_time_speed - start_time_speed
-    print(f"Calendar Processing Time: {processing_time:.3f} seconds")
-
-    return html.Div(all_months_calendar, style={'textAlign': 'center', 'fontSize': 14})
-
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 8080))
     # run on Cloud